@@ -0,0 +1,388 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database import RoutingSession, engine_options, replica_pool
+from mail import enqueue_verification_email
+from metrics import instrument_engine
+from profiling import ProfiledRoute, instrument_slow_queries
+from passwords import check_password, hash_password, password_pool
+from response_cache import conditional_response
+from models import Contact, User
+from main import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    SEARCH_DEFAULT_LIMIT,
+    SEARCH_MAX_LIMIT,
+    CONTACT_FIELDS,
+    CONTACT_PAGES_CACHE_GROUP,
+    ContactCreate,
+    ContactInDB,
+    ContactUpdate,
+    Token,
+    UserCreate,
+    UserInDB,
+    contact_cache_key,
+    contact_read_response,
+    contact_read_statement,
+    contact_rows_response,
+    contact_rows_statement,
+    contact_update_values,
+    contacts_page_cache_key,
+    contacts_page_statement,
+    tombstone_statement,
+    create_access_token,
+    delete_contact_statement,
+    insert_contact_statement,
+    search_contacts_statement,
+    next_cursor_headers,
+    parse_fields,
+    render_contact_rows,
+    stick_to_primary,
+    update_contact_statement,
+    upcoming_birthdays_statement,
+    use_replica_for,
+)
+from datetime import timedelta
+
+
+def get_async_database_url(url: str) -> str:
+    """
+    Возвращает строку подключения с асинхронным драйвером.
+
+    Args:
+        url (str): Строка подключения для синхронного движка.
+
+    Returns:
+        str: Строка подключения для asyncpg (PostgreSQL) или aiosqlite (SQLite).
+    """
+    for sync_prefix, async_prefix in (
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+def create_async_engine_for(url: str, size: int, overflow: int):
+    async_url = get_async_database_url(url)
+    return create_async_engine(async_url, **engine_options(async_url, size, overflow))
+
+
+def create_async_database(settings, info: Optional[dict] = None) -> tuple:
+    """
+    Создает асинхронные движки основной базы и реплики и фабрику сессий для них.
+
+    Args:
+        settings (Settings): Настройки приложения.
+        info (dict, optional): Начальное содержимое Session.info каждой сессии. Defaults to None.
+
+    Returns:
+        tuple: Основной движок, движок реплики (без реплики - тот же основной) и фабрика сессий.
+    """
+    async_engine = create_async_engine_for(settings.database_url, settings.db_pool_size, settings.db_max_overflow)
+    instrument_engine(async_engine.sync_engine, "async")
+    instrument_slow_queries(async_engine.sync_engine)
+    if settings.database_replica_url:
+        async_replica_engine = create_async_engine_for(settings.database_replica_url, *replica_pool(settings))
+        instrument_engine(async_replica_engine.sync_engine, "async_replica")
+        instrument_slow_queries(async_replica_engine.sync_engine)
+    else:
+        async_replica_engine = async_engine
+    session_factory = async_sessionmaker(
+        sync_session_class=RoutingSession,
+        autoflush=False,
+        expire_on_commit=False,
+        primary=async_engine.sync_engine,
+        replica=async_replica_engine.sync_engine,
+        info=info,
+    )
+    return async_engine, async_replica_engine, session_factory
+
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+async def get_db(request: Request, response: Response):
+    """
+    Создает новое асинхронное подключение к базе данных и возвращает сессию.
+
+    Чтение направляется в реплику (если она настроена), запись - в основную базу.
+    """
+    stick_to_primary(request, response)
+    async with request.app.state.async_session_factory(use_replica=use_replica_for(request)) as db:
+        yield db
+
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    """
+    Возвращает пользователя по его email.
+
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных.
+        email (str): Email пользователя.
+
+    Returns:
+        User: Пользователь.
+    """
+    return await db.scalar(select(User).where(User.email == email))
+
+
+async def get_contact_or_404(db: AsyncSession, contact_id: int) -> Contact:
+    """
+    Возвращает контакт по идентификатору или ошибку 404.
+
+    Args:
+        db (AsyncSession): Асинхронная сессия базы данных.
+        contact_id (int): Идентификатор контакта.
+
+    Raises:
+        HTTPException: Если контакт не найден.
+
+    Returns:
+        Contact: Контакт.
+    """
+    db_contact = await db.get(Contact, contact_id)
+    if db_contact is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    return db_contact
+
+
+@router.post("/contacts/", response_model=ContactInDB, status_code=status.HTTP_201_CREATED)
+async def create_contact(contact: ContactCreate, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Создает новый контакт.
+
+    Args:
+        contact (ContactCreate): Данные для создания контакта.
+        request (Request): Входящий запрос.
+        db (AsyncSession, optional): Сессия базы данных. Defaults to Depends(get_db).
+
+    Raises:
+        HTTPException: Если контакт с таким email уже существует.
+
+    Returns:
+        ContactInDB: Созданный контакт.
+    """
+    try:
+        result = ContactInDB.from_orm((await db.scalars(insert_contact_statement(contact.dict()))).one())
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+    request.app.state.response_cache.invalidate(CONTACT_PAGES_CACHE_GROUP)
+    return result
+
+
+@router.get("/contacts/", response_model=List[ContactInDB])
+async def read_contacts(request: Request, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                        fields: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Возвращает список контактов, упорядоченный по идентификатору.
+
+    Args:
+        request (Request): Входящий запрос.
+        skip (int, optional): Количество пропущенных контактов. Defaults to 0.
+        limit (int, optional): Максимальное количество возвращаемых контактов. Defaults to 100.
+        cursor (str, optional): Курсор из X-Next-Cursor предыдущей страницы. Defaults to None.
+        fields (str, optional): Поля контакта через запятую. Defaults to None.
+        db (AsyncSession, optional): Сессия базы данных. Defaults to Depends(get_db).
+
+    Returns:
+        List[ContactInDB]: Список контактов.
+    """
+    fields = parse_fields(fields)
+    cache = request.app.state.response_cache
+    version = cache.version(CONTACT_PAGES_CACHE_GROUP)
+    key = contacts_page_cache_key(skip, limit, cursor, fields)
+    entry = cache.get(key, CONTACT_PAGES_CACHE_GROUP)
+    if entry is None:
+        stmt = contact_rows_statement(contacts_page_statement(skip, limit, cursor), fields)
+        contacts = (await db.execute(stmt)).all()
+        headers = next_cursor_headers(contacts, limit)
+        entry = cache.set(key, render_contact_rows(contacts), headers, version, CONTACT_PAGES_CACHE_GROUP)
+    return conditional_response(request, entry)
+
+
+@router.get("/contacts/upcoming_birthdays", response_model=List[ContactInDB])
+async def get_upcoming_birthdays(days: int = Query(7, ge=0, le=366), fields: Optional[str] = None,
+                                 db: AsyncSession = Depends(get_db)):
+    """
+    Возвращает список контактов с днями рождения в ближайшие дни.
+
+    Args:
+        days (int, optional): Размер окна в днях, включая сегодняшний. Defaults to 7.
+        fields (str, optional): Поля контакта через запятую. Defaults to None.
+        db (AsyncSession, optional): Сессия базы данных. Defaults to Depends(get_db).
+
+    Returns:
+        List[ContactInDB]: Список контактов, ближайшие дни рождения первыми.
+    """
+    stmt = contact_rows_statement(upcoming_birthdays_statement(days), parse_fields(fields))
+    return contact_rows_response((await db.execute(stmt)).all())
+
+
+@router.get("/contacts/search/", response_model=List[ContactInDB])
+async def search_contacts(query: str, limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+                          fields: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Выполняет поиск контактов по подстроке в имени, фамилии или email.
+
+    Args:
+        query (str): Запрос для поиска контактов.
+        limit (int, optional): Максимальное количество результатов. Defaults to SEARCH_DEFAULT_LIMIT.
+        fields (str, optional): Поля контакта через запятую. Defaults to None.
+        db (AsyncSession, optional): Сессия базы данных. Defaults to Depends(get_db).
+
+    Returns:
+        List[ContactInDB]: Список найденных контактов, самые релевантные первыми.
+    """
+    stmt = search_contacts_statement(query, limit, db.get_bind().dialect.name)
+    return contact_rows_response((await db.execute(contact_rows_statement(stmt, parse_fields(fields)))).all())
+
+
+# Конвертер int не дает этим путям перекрыть синхронные /contacts/export и /contacts/import
+@router.get("/contacts/{contact_id:int}", response_model=ContactInDB)
+async def read_contact(contact_id: int, request: Request, fields: Optional[str] = None,
+                       db: AsyncSession = Depends(get_db)):
+    """
+    Возвращает контакт по его идентификатору.
+
+    Args:
+        contact_id (int): Идентификатор контакта.
+        request (Request): Входящий запрос.
+        fields (str, optional): Поля контакта через запятую. Defaults to None.
+        db (AsyncSession, optional): Сессия базы данных. Defaults to Depends(get_db).
+
+    Returns:
+        ContactInDB: Контакт.
+    """
+    fields = parse_fields(fields)
+    cache = request.app.state.response_cache
+    if fields == CONTACT_FIELDS:
+        entry = cache.get(contact_cache_key(contact_id))
+        if entry is not None:
+            return conditional_response(request, entry)
+    version = cache.version(contact_cache_key(contact_id))
+    row = (await db.execute(contact_read_statement(contact_id, fields))).first()
+    return contact_read_response(request, row, fields, version)
+
+
+@router.put("/contacts/{contact_id:int}", response_model=ContactInDB)
+async def update_contact(contact_id: int, contact: ContactUpdate, request: Request,
+                         db: AsyncSession = Depends(get_db)):
+    """
+    Обновляет информацию о контакте.
+
+    Args:
+        contact_id (int): Идентификатор контакта.
+        contact (ContactUpdate): Обновленные данные контакта.
+        request (Request): Входящий запрос.
+        db (AsyncSession, optional): Сессия базы данных. Defaults to Depends(get_db).
+
+    Raises:
+        HTTPException: Если контакт не найден или новый email занят другим контактом.
+
+    Returns:
+        ContactInDB: Обновленный контакт.
+    """
+    values = contact_update_values(contact)
+    if not values:
+        return await get_contact_or_404(db, contact_id)
+    try:
+        db_contact = (await db.scalars(update_contact_statement(contact_id, values))).one_or_none()
+        if db_contact is None:
+            raise HTTPException(status_code=404, detail="Contact not found")
+        result = ContactInDB.from_orm(db_contact)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+    request.app.state.response_cache.invalidate(contact_cache_key(contact_id), CONTACT_PAGES_CACHE_GROUP)
+    return result
+
+
+@router.delete("/contacts/{contact_id:int}")
+async def delete_contact(contact_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Удаляет контакт.
+
+    Args:
+        contact_id (int): Идентификатор контакта.
+        request (Request): Входящий запрос.
+        db (AsyncSession, optional): Сессия базы данных. Defaults to Depends(get_db).
+
+    Returns:
+        dict: Словарь с сообщением об успешном удалении контакта.
+    """
+    if await db.scalar(delete_contact_statement(contact_id)) is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    await db.execute(tombstone_statement([contact_id], db.get_bind().dialect.name))
+    await db.commit()
+    request.app.state.response_cache.invalidate(contact_cache_key(contact_id), CONTACT_PAGES_CACHE_GROUP)
+    return {"detail": "Contact deleted"}, 204
+
+
+@router.post("/users/", response_model=UserInDB, status_code=201)
+async def create_user_endpoint(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Создает нового пользователя.
+
+    Хэширование пароля выполняется в пуле процессов bcrypt, чтобы не
+    блокировать цикл событий; письмо только ставится в очередь отправки.
+
+    Args:
+        user (UserCreate): Данные для создания пользователя.
+        db (AsyncSession, optional): Сессия базы данных. Defaults to Depends(get_db).
+
+    Raises:
+        HTTPException: Если пользователь с таким email уже существует.
+
+    Returns:
+        UserInDB: Созданный пользователь.
+    """
+    if await get_user_by_email(db, user.email):
+        raise HTTPException(status_code=409, detail="Email already registered")
+
+    hashed_password = await password_pool.run_async(hash_password, user.password)
+    new_user = User(email=user.email, hashed_password=hashed_password)
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+
+    enqueue_verification_email(new_user.email)
+    return new_user
+
+
+@router.post("/token", response_model=Token)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(),
+                                 db: AsyncSession = Depends(get_db)):
+    """
+    Создает токен доступа для аутентификации пользователя.
+
+    Args:
+        form_data (OAuth2PasswordRequestForm, optional): Данные формы для аутентификации.
+            Defaults to Depends().
+        db (AsyncSession, optional): Сессия базы данных. Defaults to Depends(get_db).
+
+    Raises:
+        HTTPException: Если аутентификация не удалась.
+
+    Returns:
+        Token: Токен доступа.
+    """
+    user = await get_user_by_email(db, form_data.username)
+    if not user or not await password_pool.run_async(check_password, form_data.password, user.hashed_password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = create_access_token(
+        data={"sub": user.email}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
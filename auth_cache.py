@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from cache_versions import LocalVersions, SQLiteVersions
+
+# Максимальное количество токенов в кэше
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", 10000))
+# Время жизни записи в секундах (не дольше срока действия токена)
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", 60))
+# Время жизни записи, если у воркеров нет общих счетчиков инвалидаций
+PRINCIPAL_CACHE_LOCAL_TTL = 5.0
+# Ключ счетчика, который увеличивается при сбросе записей всех пользователей
+ALL_PRINCIPALS = "principal:*"
+
+
+class PrincipalCache:
+    """
+    Ограниченный LRU-кэш проверенных токенов и пользователей.
+
+    Запись живет не дольше ttl и не дольше поля exp токена. Все записи
+    пользователя удаляются через invalidate(email) при его изменении.
+    Инвалидация увеличивает счетчик пользователя в versions (clear - общий
+    счетчик всех пользователей), и запись отдается, только пока эти
+    счетчики не изменились с момента, снятого snapshot до чтения
+    пользователя из базы. С общими для воркеров счетчиками (SQLiteVersions)
+    изменение пользователя в одном воркере сбрасывает его записи и в
+    остальных.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, versions=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.versions = versions if versions is not None else LocalVersions()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._tokens_by_email = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        """
+        Возвращает закэшированного пользователя для токена.
+
+        Args:
+            token (str): Токен доступа.
+
+        Returns:
+            object: Пользователь или None, если записи нет или она устарела.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+        # Счетчики читаются без блокировки: SQLiteVersions может обратиться к файлу
+        if entry is not None and entry[2] > now and entry[3] == self.snapshot(entry[0]):
+            with self._lock:
+                if token in self._entries:
+                    self._entries.move_to_end(token)
+                self.hits += 1
+            return entry[1]
+        with self._lock:
+            if entry is not None and self._entries.get(token) is entry:
+                self._remove(token)
+            self.misses += 1
+        return None
+
+    def snapshot(self, email: str) -> Tuple[int, int]:
+        """
+        Возвращает счетчики инвалидаций пользователя.
+
+        Args:
+            email (str): Email пользователя.
+
+        Returns:
+            Tuple[int, int]: Общий счетчик и счетчик пользователя.
+        """
+        everyone, user = self.versions.current(ALL_PRINCIPALS, principal_key(email))
+        return everyone[0], user[0]
+
+    def set(self, token: str, email: str, user, token_expires_at: float = None, version: Tuple[int, int] = None):
+        """
+        Сохраняет пользователя для проверенного токена.
+
+        Args:
+            token (str): Токен доступа.
+            email (str): Email пользователя, по которому запись инвалидируется.
+            user (object): Пользователь.
+            token_expires_at (float, optional): Значение exp токена (Unix time).
+            version (Tuple[int, int], optional): Значение snapshot(email) до чтения пользователя из базы.
+        """
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        current = self.snapshot(email)
+        if version is not None and version != current:
+            return
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (email, user, expires_at, current)
+            self._tokens_by_email.setdefault(email, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, email: str):
+        """
+        Удаляет все записи пользователя.
+
+        Args:
+            email (str): Email пользователя.
+        """
+        self.versions.bump(principal_key(email))
+        with self._lock:
+            for token in self._tokens_by_email.pop(email, ()):
+                self._entries.pop(token, None)
+
+    def clear(self):
+        self.versions.bump(ALL_PRINCIPALS)
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_email.clear()
+
+    def stats(self) -> dict:
+        """
+        Возвращает счетчики попаданий и промахов.
+
+        Returns:
+            dict: Счетчики и текущий размер кэша.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def _remove(self, token: str):
+        email = self._entries.pop(token)[0]
+        tokens = self._tokens_by_email.get(email)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_email[email]
+
+
+def principal_key(email: str) -> str:
+    return f"principal:{email}"
+
+
+def create_principal_cache(storage: Optional[str] = None, workers: int = 1) -> PrincipalCache:
+    """
+    Создает кэш пользователей приложения со счетчиками инвалидаций для числа воркеров.
+
+    Без общего файла счетчиков каждый воркер видит только свои
+    инвалидации, поэтому при нескольких воркерах запись живет не дольше
+    PRINCIPAL_CACHE_LOCAL_TTL: измененный в другом воркере пользователь
+    (например, деактивированный) остается в кэше этого воркера не дольше
+    нескольких секунд.
+
+    Args:
+        storage (str, optional): Файл SQLite для общих счетчиков воркеров. Defaults to None.
+        workers (int, optional): Число воркеров uvicorn. Defaults to 1.
+
+    Returns:
+        PrincipalCache: Кэш пользователей.
+    """
+    if storage:
+        return PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL, SQLiteVersions(storage))
+    ttl = PRINCIPAL_CACHE_TTL if workers <= 1 else min(PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_LOCAL_TTL)
+    return PrincipalCache(PRINCIPAL_CACHE_SIZE, ttl)
@@ -0,0 +1,233 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Хранилище аватаров: "cloudinary" или "local"
+AVATAR_STORAGE = os.environ.get("AVATAR_STORAGE", "cloudinary")
+# Каталог и URL-префикс для локального хранилища
+AVATAR_LOCAL_ROOT = os.environ.get("AVATAR_LOCAL_ROOT", "media")
+AVATAR_LOCAL_BASE_URL = os.environ.get("AVATAR_LOCAL_BASE_URL", "/media")
+# Максимальный размер загружаемого файла в байтах
+AVATAR_MAX_BYTES = int(os.environ.get("AVATAR_MAX_BYTES", 5 * 1024 * 1024))
+# Стороны квадратных уменьшенных копий в пикселях
+AVATAR_SIZES = (256, 128, 64)
+AVATAR_UPLOAD_WORKERS = int(os.environ.get("AVATAR_UPLOAD_WORKERS", 2))
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+
+class AvatarTooLarge(Exception):
+    """
+    Загруженный файл больше AVATAR_MAX_BYTES.
+    """
+
+
+class InvalidAvatar(Exception):
+    """
+    Загруженный файл не удалось прочитать как изображение.
+    """
+
+
+def verify_image(path: str):
+    """
+    Проверяет, что файл - целое изображение, из которого make_variants
+    сможет сделать уменьшенные копии.
+
+    Args:
+        path (str): Путь к файлу.
+
+    Raises:
+        InvalidAvatar: Если формат не распознан или файл поврежден.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception as error:
+        # Pillow сообщает о поврежденных файлах исключениями разных типов
+        raise InvalidAvatar(str(error)) from error
+
+
+def spool_upload(file, max_bytes: int = AVATAR_MAX_BYTES):
+    """
+    Копирует загруженный файл во временный файл, одновременно вычисляя SHA-256.
+
+    Args:
+        file: Файловый объект загрузки (UploadFile.file).
+        max_bytes (int, optional): Максимальный размер файла. Defaults to AVATAR_MAX_BYTES.
+
+    Raises:
+        AvatarTooLarge: Если файл больше max_bytes.
+
+    Returns:
+        tuple: Хэш содержимого (hex) и путь к временному файлу.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    spool = tempfile.NamedTemporaryFile(prefix="avatar-", delete=False)
+    try:
+        with spool:
+            while True:
+                chunk = file.read(SPOOL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise AvatarTooLarge()
+                digest.update(chunk)
+                spool.write(chunk)
+    except BaseException:
+        os.remove(spool.name)
+        raise
+    return digest.hexdigest(), spool.name
+
+
+def make_variants(path: str, sizes=AVATAR_SIZES) -> dict:
+    """
+    Создает уменьшенные копии изображения в формате PNG.
+
+    Args:
+        path (str): Путь к исходному изображению.
+        sizes (tuple, optional): Максимальные стороны копий. Defaults to AVATAR_SIZES.
+
+    Returns:
+        dict: Путь к временному файлу для каждого размера.
+    """
+    from PIL import Image, ImageOps
+
+    variants = {}
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image)
+        for size in sizes:
+            variant = image.copy()
+            variant.thumbnail((size, size))
+            fd, variant_path = tempfile.mkstemp(prefix=f"avatar-{size}-", suffix=".png")
+            with os.fdopen(fd, "wb") as f:
+                variant.save(f, format="PNG")
+            variants[str(size)] = variant_path
+    return variants
+
+
+class LocalAvatarStorage:
+    """
+    Хранилище аватаров в локальном каталоге (для разработки и тестов).
+    """
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def save(self, key: str, path: str):
+        target = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+
+
+class CloudinaryAvatarStorage:
+    """
+    Хранилище аватаров в Cloudinary; ключ используется как public_id.
+    """
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str):
+        self._config = {"cloud_name": cloud_name, "api_key": api_key, "api_secret": api_secret}
+        self._cloudinary = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        # SDK Cloudinary импортируется и настраивается при первой загрузке аватара
+        with self._lock:
+            if self._cloudinary is None:
+                import cloudinary
+                import cloudinary.uploader  # noqa: F401
+
+                cloudinary.config(**self._config)
+                self._cloudinary = cloudinary
+            return self._cloudinary
+
+    def url(self, key: str) -> str:
+        return self._client().CloudinaryImage(key).build_url(secure=True)
+
+    def save(self, key: str, path: str):
+        self._client().uploader.upload(path, public_id=key, overwrite=False)
+
+
+class AvatarPipeline:
+    """
+    Фоновая обработка аватаров с адресацией по содержимому.
+
+    Ключ аватара - SHA-256 его содержимого, поэтому URL известен сразу,
+    до загрузки. Уменьшенные копии создаются и загружаются в хранилище
+    фоновыми потоками; обработчик запроса только сохраняет файл и хэш.
+    """
+
+    def __init__(self, storage, sizes=AVATAR_SIZES, workers: int = AVATAR_UPLOAD_WORKERS):
+        self.storage = storage
+        self.sizes = sizes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="avatar")
+
+    @staticmethod
+    def key(digest: str, variant: str = "original") -> str:
+        return f"avatars/{digest}/{variant}"
+
+    def url(self, digest: str, variant: str = "original") -> str:
+        return self.storage.url(self.key(digest, variant))
+
+    def submit(self, digest: str, path: str, on_failure=None) -> Future:
+        """
+        Ставит в очередь создание копий и загрузку аватара.
+
+        Args:
+            digest (str): SHA-256 содержимого.
+            path (str): Временный файл; удаляется после обработки.
+            on_failure (callable, optional): Вызывается с digest, если загрузка не удалась.
+
+        Returns:
+            Future: Завершается после загрузки всех файлов.
+        """
+        return self._executor.submit(self._process, digest, path, on_failure)
+
+    def _process(self, digest: str, path: str, on_failure):
+        files = {"original": path}
+        try:
+            try:
+                files.update(make_variants(path, self.sizes))
+            except ImportError:
+                logger.warning("Pillow is not installed, uploading avatar %s without resized variants", digest)
+            for variant, file_path in files.items():
+                self.storage.save(self.key(digest, variant), file_path)
+        except Exception:
+            logger.exception("Failed to process avatar %s", digest)
+            if on_failure is not None:
+                on_failure(digest)
+            raise
+        finally:
+            for file_path in files.values():
+                os.remove(file_path)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+def create_avatar_storage():
+    """
+    Создает хранилище аватаров по настройке AVATAR_STORAGE.
+
+    Returns:
+        LocalAvatarStorage | CloudinaryAvatarStorage: Хранилище аватаров.
+    """
+    if AVATAR_STORAGE == "local":
+        return LocalAvatarStorage(AVATAR_LOCAL_ROOT, AVATAR_LOCAL_BASE_URL)
+    return CloudinaryAvatarStorage(
+        cloud_name="your_cloud_name",
+        api_key="your_api_key",
+        api_secret="your_api_secret",
+    )
@@ -0,0 +1,103 @@
+"""
+Сравнивает пропускную способность синхронного и асинхронного режимов работы с БД.
+
+Для каждого режима запускается отдельный процесс с DB_MODE=sync или
+DB_MODE=async; приложение вызывается внутри процесса через httpx.AsyncClient,
+поэтому сетевой стек не влияет на результат. Кэш ответов выключен, чтобы
+каждый запрос доходил до базы. База берется из DATABASE_URL.
+
+Запуск:
+    DATABASE_URL=postgresql://... python bench_db_mode.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+
+async def run_mode(requests: int, concurrency: int) -> dict:
+    """
+    Выполняет нагрузку на приложение в текущем режиме DB_MODE.
+
+    Args:
+        requests (int): Общее количество запросов.
+        concurrency (int): Количество одновременных клиентов.
+
+    Returns:
+        dict: Пропускная способность и перцентили задержки.
+    """
+    import main
+    from database import create_schema
+
+    create_schema(main.app.state.engine)
+    # Иначе замерялся бы кэш ответов, а не режим работы с базой
+    main.app.state.response_cache.enabled = False
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        response = await client.post("/contacts/", json={
+            "first_name": "Bench",
+            "last_name": "Mark",
+            "email": f"bench-{uuid.uuid4().hex}@example.com",
+            "phone": "123456789",
+            "birthday": "2000-01-01",
+        })
+        response.raise_for_status()
+        contact_id = response.json()["id"]
+        paths = [f"/contacts/{contact_id}", "/contacts/?limit=20"]
+        latencies = []
+
+        async def worker(count: int):
+            for i in range(count):
+                started = time.perf_counter()
+                response = await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "mode": main.app.state.settings.db_mode,
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(run_mode(args.requests, args.concurrency))))
+        return
+
+    results = []
+    for mode in ("sync", "async"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=dict(os.environ, DB_MODE=mode), check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for result in results:
+        print(f"{result['mode']:<8}{result['requests_per_second']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}")
+    print(f"async/sync: {results[1]['requests_per_second'] / results[0]['requests_per_second']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Бенчмарк поиска дубликатов (dedupe.py).
+
+База наполняется --contacts контактами, из которых доля --duplicates - копии
+других контактов с другим email, иначе записанным телефоном, измененным
+регистром или переставленными именем и фамилией. Затем выполняется
+run_dedupe и выводятся время, пиковая память процесса, а также точность и
+полнота найденных пар относительно внесенных дубликатов.
+
+По умолчанию используется локальная SQLite; для PostgreSQL задайте DATABASE_URL.
+
+Запуск:
+    python bench_dedupe.py --contacts 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import resource
+import time
+import uuid
+from datetime import date, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_dedupe.db")
+
+from sqlalchemy import delete, insert, select  # noqa: E402
+
+import database  # noqa: E402
+from dedupe import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_BLOCK_SIZE, DEFAULT_THRESHOLD, run_dedupe  # noqa: E402
+from models import Contact, ContactMergeCandidate, contact_values  # noqa: E402
+from settings import Settings  # noqa: E402
+
+FIRST_NAMES = ["Anna", "John", "Maria", "Ivan", "Olga", "Peter", "Elena", "Dmitriy", "Sofia", "Alex"]
+LAST_NAMES = ["Smith", "Ivanov", "Petrova", "Brown", "Kuznetsov", "Miller", "Sokolova", "Wilson"]
+SEED_BATCH_SIZE = 10000
+
+
+def random_contact(rng: random.Random) -> dict:
+    # Суффикс делает фамилии достаточно разнообразными, как в реальной базе
+    return {
+        "first_name": rng.choice(FIRST_NAMES),
+        "last_name": f"{rng.choice(LAST_NAMES)}{rng.randrange(10000)}",
+        "phone": f"+7 9{rng.randrange(10 ** 9):09d}",
+        "birthday": date(1950, 1, 1) + timedelta(days=rng.randrange(365 * 55)),
+    }
+
+
+def duplicate_of(original: dict, rng: random.Random) -> dict:
+    digits = original["phone"][-10:]
+    copy = dict(original, phone=f"8 ({digits[:3]}) {digits[3:6]}-{digits[6:8]}-{digits[8:]}")
+    if rng.random() < 0.5:
+        copy["first_name"], copy["last_name"] = original["last_name"], original["first_name"]
+    else:
+        copy["last_name"] = original["last_name"].upper()
+    return copy
+
+
+def seed(engine, count: int, duplicates: float, rng: random.Random) -> set:
+    """
+    Заново наполняет таблицу контактов.
+
+    Returns:
+        set: Пары идентификаторов (меньший, больший) внесенных дубликатов,
+        включая пары копий одного контакта.
+    """
+    groups = {}
+    originals = []
+    with engine.begin() as connection:
+        connection.execute(delete(ContactMergeCandidate))
+        connection.execute(delete(Contact))
+    next_id = 1
+    while next_id <= count:
+        batch = []
+        for contact_id in range(next_id, min(next_id + SEED_BATCH_SIZE, count + 1)):
+            if originals and rng.random() < duplicates:
+                original_id, original = rng.choice(originals)
+                values = duplicate_of(original, rng)
+                groups.setdefault(original_id, [original_id]).append(contact_id)
+            else:
+                values = random_contact(rng)
+                if len(originals) < 100000:
+                    originals.append((contact_id, values))
+            batch.append(contact_values(dict(values, id=contact_id, email=f"{uuid.uuid4().hex}@example.com")))
+        with engine.begin() as connection:
+            connection.execute(insert(Contact), batch)
+        next_id += len(batch)
+    return {pair for ids in groups.values() for pair in itertools.combinations(ids, 2)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=200000)
+    parser.add_argument("--duplicates", type=float, default=0.05, help="доля контактов-дубликатов")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--max-block-size", type=int, default=DEFAULT_MAX_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    engine, _ = database.create_engines(Settings())
+    database.create_schema(engine)
+    started = time.perf_counter()
+    expected = seed(engine, args.contacts, args.duplicates, random.Random(42))
+    print(f"seeded {args.contacts} contacts with {len(expected)} duplicate pairs in {time.perf_counter() - started:.1f} s")
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    stats = run_dedupe(engine, args.chunk_size, args.threshold, args.max_block_size)
+    elapsed = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with engine.connect() as connection:
+        found = set(map(tuple, connection.execute(
+            select(ContactMergeCandidate.contact_id, ContactMergeCandidate.duplicate_id)
+        ).all()))
+    true_positives = len(found & expected)
+    print(", ".join(f"{name}: {value}" for name, value in stats.items()))
+    print(f"dedupe: {elapsed:.1f} s, {args.contacts / elapsed:,.0f} contacts/s, "
+          f"peak RSS {rss_after / 1024:.0f} MB (+{(rss_after - rss_before) / 1024:.0f} MB)")
+    print(f"precision {true_positives / max(len(found), 1):.3f}, recall {true_positives / max(len(expected), 1):.3f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,99 @@
+"""
+Сравнивает пропускную способность /token без пула bcrypt и с пулом процессов.
+
+Для каждого варианта запускается отдельный процесс: PASSWORD_HASH_WORKERS=0
+(bcrypt в потоке обработчика, как раньше) и PASSWORD_HASH_WORKERS=<число ядер>.
+Приложение вызывается внутри процесса через httpx.AsyncClient. База берется
+из DATABASE_URL.
+
+Запуск:
+    DATABASE_URL=sqlite:///bench.db python bench_login.py --requests 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+
+async def run_logins(requests: int, concurrency: int) -> dict:
+    """
+    Создает пользователя и выполняет requests входов через /token.
+
+    Args:
+        requests (int): Общее количество входов.
+        concurrency (int): Количество одновременных клиентов.
+
+    Returns:
+        dict: Пропускная способность входов.
+    """
+    import main
+    import passwords
+    from database import create_schema
+
+    create_schema(main.app.state.engine)
+
+    credentials = {"username": f"bench-{uuid.uuid4().hex}@example.com", "password": "bench-password"}
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        response = await client.post("/users/", json={
+            "email": credentials["username"], "password": credentials["password"],
+        })
+        response.raise_for_status()
+        statuses = []
+
+        async def worker(count: int):
+            for _ in range(count):
+                response = await client.post("/token", data=credentials)
+                statuses.append(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    passwords.password_pool.shutdown()
+    ok = statuses.count(200)
+    cores = os.cpu_count() or 1
+    return {
+        "workers": passwords.PASSWORD_HASH_WORKERS,
+        "logins": ok,
+        "rejected": len(statuses) - ok,
+        "logins_per_second": round(ok / elapsed, 1),
+        "logins_per_second_per_core": round(ok / elapsed / cores, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(run_logins(args.requests, args.concurrency))))
+        return
+
+    results = []
+    for workers in (0, os.cpu_count() or 1):
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            # Без ограничения частоты: замеряется bcrypt, а не ответы 429
+            env=dict(os.environ, PASSWORD_HASH_WORKERS=str(workers), RATE_LIMITS="{}"),
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'workers':<10}{'logins/s':>12}{'per core':>12}{'503':>8}")
+    for result in results:
+        print(f"{result['workers']:<10}{result['logins_per_second']:>12}"
+              f"{result['logins_per_second_per_core']:>12}{result['rejected']:>8}")
+
+
+if __name__ == "__main__":
+    main()
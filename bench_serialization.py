@@ -0,0 +1,96 @@
+"""
+Бенчмарк сериализации списков контактов.
+
+Сравниваются два способа построить тело ответа для 100, 1000 и 10000 строк:
+
+* orm: select(Contact) -> ContactInDB.from_orm -> jsonable_encoder -> JSONResponse
+  (прежний путь через response_model);
+* rows: строки Core с колонками ContactInDB -> orjson (render_contact_rows).
+
+Время включает запрос к базе. Перед замером проверяется, что оба способа
+дают одинаковые байты. По умолчанию используется локальная SQLite; для
+PostgreSQL задайте DATABASE_URL.
+
+Запуск:
+    python bench_serialization.py --repeats 20
+"""
+import argparse
+import os
+import statistics
+import time
+import uuid
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_serialization.db")
+
+from sqlalchemy import delete, func, insert, select  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+from models import Contact, contact_values  # noqa: E402
+
+SIZES = (100, 1000, 10000)
+
+
+def seed(count: int):
+    with main.app.state.session_factory() as db:
+        existing = db.scalar(select(func.count()).select_from(Contact))
+        if existing >= count:
+            return
+        db.execute(delete(Contact))
+        db.execute(insert(Contact), [
+            contact_values({
+                "first_name": f"Имя{i}",
+                "last_name": f"Фамилия{i}",
+                "email": f"{uuid.uuid4().hex}@example.com",
+                "phone": str(10 ** 8 + i),
+                "birthday": date(1950 + i % 50, 1 + i % 12, 1 + i % 28),
+                "additional_info": None if i % 3 else "seeded by bench_serialization",
+            })
+            for i in range(count)
+        ])
+        db.commit()
+
+
+def render_orm(db, limit: int) -> bytes:
+    contacts = db.scalars(select(Contact).order_by(Contact.id).limit(limit)).all()
+    return main.render_json([main.ContactInDB.from_orm(contact) for contact in contacts])
+
+
+def render_rows(db, limit: int) -> bytes:
+    rows = db.execute(main.contact_rows_statement(select(Contact).order_by(Contact.id).limit(limit))).all()
+    return main.render_contact_rows(rows)
+
+
+def measure(render, limit: int, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        # Новая сессия на каждый повтор, как в обработчике запроса
+        with main.app.state.session_factory() as db:
+            started = time.perf_counter()
+            render(db, limit)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    database.create_schema(main.app.state.engine)
+    seed(max(SIZES))
+
+    print(f"encoder: {'orjson' if main.orjson is not None else 'json (orjson is not installed)'}")
+    print(f"{'rows':>8}{'orm ms':>12}{'rows ms':>12}{'speedup':>10}")
+    for size in SIZES:
+        with main.app.state.session_factory() as db:
+            if render_orm(db, size) != render_rows(db, size):
+                raise RuntimeError(f"Different JSON for {size} rows")
+        orm = measure(render_orm, size, args.repeats)
+        rows = measure(render_rows, size, args.repeats)
+        print(f"{size:>8}{orm * 1000:>12.2f}{rows * 1000:>12.2f}{orm / rows:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,121 @@
+"""
+Бенчмарк холодного старта воркера.
+
+Замеряются две величины, каждая в отдельном процессе --runs раз:
+
+* время импорта main по данным "python -X importtime" и список модулей,
+  импорт которых занимает больше всего времени (--top);
+* время от запуска uvicorn до первого успешного ответа на GET /metrics.
+
+Приложение при старте не обращается к базе данных, поэтому замер можно
+выполнять и с недоступной базой (например, DATABASE_URL на закрытый порт).
+По умолчанию используется локальная SQLite.
+
+Запуск:
+    python bench_startup.py --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Разбирает вывод "python -X importtime".
+
+    Args:
+        stderr (str): Вывод интерпретатора в stderr.
+
+    Returns:
+        list: Кортежи (модуль, собственное время, суммарное время) в микросекундах.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def measure_import(env: dict) -> list:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(env: dict, timeout: float) -> float:
+    """
+    Запускает uvicorn и ждет первого успешного ответа.
+
+    Args:
+        env (dict): Переменные окружения процесса.
+        timeout (float): Сколько секунд ждать ответа.
+
+    Raises:
+        RuntimeError: Если сервер не ответил за timeout.
+
+    Returns:
+        float: Время до первого ответа в секундах.
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/metrics"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError(f"No response from {url} in {timeout} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="сколько самых медленных модулей показать")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///bench_startup.db")
+
+    import_runs = [measure_import(env) for _ in range(args.runs)]
+    main_times = [cumulative for modules in import_runs for name, _, cumulative in modules if name == "main"]
+    print(f"import main: median {statistics.median(main_times) / 1000:.1f} ms over {args.runs} runs")
+
+    # Самые медленные модули берутся из последнего прогона, когда кэш файловой системы прогрет
+    print(f"{'module':<50}{'self ms':>10}{'cumulative ms':>16}")
+    for name, self_us, cumulative_us in sorted(import_runs[-1], key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<50}{self_us / 1000:>10.1f}{cumulative_us / 1000:>16.1f}")
+
+    first_request = [measure_first_request(env, args.timeout) for _ in range(args.runs)]
+    print(f"time to first request: median {statistics.median(first_request) * 1000:.1f} ms, "
+          f"max {max(first_request) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Tuple
+
+# Сколько секунд воркер использует прочитанный из SQLite счетчик, не перечитывая файл
+CACHE_VERSION_REFRESH = float(os.environ.get("CACHE_VERSION_REFRESH", 1))
+# Сколько прочитанных счетчиков воркер держит в памяти, прежде чем удалить устаревшие
+CACHE_VERSION_READS = 10000
+
+
+class LocalVersions:
+    """
+    Счетчики инвалидаций по ключам в памяти процесса.
+
+    Подходят только для одного воркера: инвалидацию в одном процессе
+    остальные не видят.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def current(self, *keys: str) -> List[Tuple[int, float]]:
+        """
+        Возвращает счетчики ключей.
+
+        Args:
+            keys (str): Ключи.
+
+        Returns:
+            List[Tuple[int, float]]: Для каждого ключа номер инвалидации и ее время (Unix time).
+        """
+        return [self._versions.get(key, (0, 0.0)) for key in keys]
+
+    def bump(self, *keys: str):
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                self._versions[key] = (self._versions.get(key, (0, 0.0))[0] + 1, now)
+
+
+class SQLiteVersions:
+    """
+    Счетчики инвалидаций по ключам в файле SQLite, общие для всех воркеров на одном хосте.
+
+    Инвалидация в любом воркере увеличивает общий счетчик ключа. Чтобы не
+    обращаться к файлу при каждой проверке, прочитанный счетчик используется
+    еще refresh секунд: свою инвалидацию воркер видит сразу, чужую - не
+    позже чем через refresh секунд.
+    """
+
+    def __init__(self, path: str, refresh: float = CACHE_VERSION_REFRESH, clock=time.monotonic):
+        self.path = path
+        self.refresh = refresh
+        self.clock = clock
+        self._local = threading.local()
+        self._reads: Dict[str, Tuple[Tuple[int, float], float]] = {}
+        self._lock = threading.Lock()
+        connection = self._connect()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_versions ("
+            "key TEXT PRIMARY KEY, version INTEGER NOT NULL, invalidated_at REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Соединение SQLite нельзя использовать из разных потоков
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def current(self, *keys: str) -> List[Tuple[int, float]]:
+        """
+        Возвращает счетчики ключей.
+
+        Args:
+            keys (str): Ключи.
+
+        Returns:
+            List[Tuple[int, float]]: Для каждого ключа номер инвалидации и ее время (Unix time).
+        """
+        now = self.clock()
+        with self._lock:
+            reads = {key: self._reads.get(key) for key in keys}
+        stale = [key for key, read in reads.items() if read is None or now - read[1] >= self.refresh]
+        if stale:
+            versions = self._select(self._connect(), stale)
+            self._remember(versions, now)
+            reads.update((key, (versions[key], now)) for key in stale)
+        return [reads[key][0] for key in keys]
+
+    def bump(self, *keys: str):
+        connection = self._connect()
+        now = self.clock()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO cache_versions (key, version, invalidated_at) VALUES (?, 1, ?) "
+                "ON CONFLICT (key) DO UPDATE SET version = version + 1, invalidated_at = excluded.invalidated_at",
+                [(key, time.time()) for key in keys],
+            )
+            versions = self._select(connection, keys)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._remember(versions, now)
+
+    def _select(self, connection: sqlite3.Connection, keys) -> Dict[str, Tuple[int, float]]:
+        keys = list(keys)
+        rows = connection.execute(
+            f"SELECT key, version, invalidated_at FROM cache_versions WHERE key IN ({', '.join('?' * len(keys))})",
+            keys,
+        ).fetchall()
+        versions = dict.fromkeys(keys, (0, 0.0))
+        versions.update((key, (version, invalidated_at)) for key, version, invalidated_at in rows)
+        return versions
+
+    def _remember(self, versions: Dict[str, Tuple[int, float]], now: float):
+        with self._lock:
+            if len(self._reads) > CACHE_VERSION_READS:
+                self._reads = {key: read for key, read in self._reads.items() if now - read[1] < self.refresh}
+            for key, version in versions.items():
+                # Чтение, начатое до bump, не должно затереть более новый счетчик
+                read = self._reads.get(key)
+                if read is None or read[0][0] <= version[0]:
+                    self._reads[key] = (version, now)
@@ -0,0 +1,374 @@
+"""
+Ищет контакты-дубликаты и записывает пары-кандидаты в contact_merge_candidates.
+
+База проверяет уникальность только для email, поэтому один человек может
+храниться в нескольких контактах с разными email или по-разному записанным
+телефоном. Задача работает в два прохода, и память не зависит от числа
+контактов:
+
+1. контакты читаются порциями по --chunk-size; для каждого вычисляются
+   нормализованные признаки и ключи блоков (телефон, email до @, имя и
+   фамилия, день рождения с инициалами), которые записываются во временную
+   таблицу;
+2. временная таблица читается порциями в порядке ключа, и сравниваются только
+   контакты с общим ключом. Пары оцениваются векторно в NumPy; пары с оценкой
+   не ниже --threshold записываются в contact_merge_candidates.
+
+Блоки больше --max-block-size пропускаются: такой ключ (например, общий
+телефон организации) не отличает людей, а число пар в нем растет квадратично.
+Кандидаты предыдущего запуска удаляются. Таблица contact_merge_candidates
+создается командой python migrate.py.
+
+Запуск:
+    python dedupe.py
+    python dedupe.py --database-url sqlite:///local.db --threshold 0.7
+"""
+import argparse
+import functools
+import re
+import time
+import unicodedata
+import zlib
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import BigInteger, Column, Index, Integer, MetaData, String, Table, delete, func, insert, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.schema import CreateTable
+
+from database import create_engines
+from models import Contact, ContactMergeCandidate
+from settings import Settings
+
+# Веса признаков в оценке сходства; сумма равна 1. Совпадения одного имени
+# недостаточно для порога по умолчанию, нужен еще хотя бы один признак
+WEIGHTS = {"name": 0.4, "phone": 0.2, "email": 0.2, "birthday": 0.2}
+DEFAULT_THRESHOLD = 0.55
+DEFAULT_CHUNK_SIZE = 50000
+DEFAULT_MAX_BLOCK_SIZE = 50
+# Телефоны сравниваются по последним цифрам, чтобы не мешали +7, 8 и код страны
+PHONE_DIGITS = 10
+PHONE_MIN_DIGITS = 7
+# Больше любого идентификатора Integer; позволяет пропустить блок целиком
+MAX_CONTACT_ID = 2 ** 31 - 1
+
+insert_ignore = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+# Временная таблица ключей блоков; существует только в соединении задачи
+dedupe_metadata = MetaData()
+dedupe_keys = Table(
+    "dedupe_keys", dedupe_metadata,
+    Column("block_key", String, nullable=False),
+    Column("contact_id", Integer, nullable=False),
+    Column("phone", BigInteger, nullable=False),
+    Column("birthday", Integer, nullable=False),
+    Column("email", String, nullable=False),
+    Column("name_sketch", BigInteger, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+dedupe_keys_index = Index("ix_dedupe_keys_block", dedupe_keys.c.block_key, dedupe_keys.c.contact_id)
+
+# Все, кроме букв и цифр; диакритические знаки после NFKD тоже не входят в \w
+NOT_ALNUM = re.compile(r"[\W_]+")
+NOT_DIGIT = re.compile(r"\D+")
+
+# Количество единичных битов для каждого байта
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def normalize_name(value: Optional[str]) -> str:
+    # NFKD отделяет диакритику (ё -> е + ¨), а шаблон удаляет ее вместе с пробелами и знаками
+    return NOT_ALNUM.sub("", unicodedata.normalize("NFKD", value or "").casefold())
+
+
+def normalize_phone(value: Optional[str]) -> int:
+    """
+    Приводит телефон к числу из последних PHONE_DIGITS цифр.
+
+    Args:
+        value (str, optional): Телефон в любом формате.
+
+    Returns:
+        int: Нормализованный телефон или 0, если цифр меньше PHONE_MIN_DIGITS.
+    """
+    digits = NOT_DIGIT.sub("", value or "")
+    if len(digits) < PHONE_MIN_DIGITS:
+        return 0
+    return int(digits[-PHONE_DIGITS:])
+
+
+def normalize_email(value: Optional[str]) -> str:
+    # Сравнивается только имя ящика без домена, тегов "+..." и точек
+    return normalize_name((value or "").split("@")[0].split("+")[0])
+
+
+def name_sketch(first_name: str, last_name: str) -> int:
+    """
+    Возвращает 64-битный набор биграмм нормализованных имени и фамилии.
+
+    Порядок имени и фамилии не важен. Доля общих битов двух наборов
+    приближает сходство имен и считается векторно (score_pairs).
+
+    Args:
+        first_name (str): Нормализованное имя.
+        last_name (str): Нормализованная фамилия.
+
+    Returns:
+        int: Набор битов как знаковое 64-битное число (для BigInteger).
+    """
+    bits = bigram_bits(first_name) | bigram_bits(last_name)
+    return bits - (1 << 64) if bits >= 1 << 63 else bits
+
+
+# Имена часто повторяются, поэтому набор биграмм каждого имени кэшируется
+@functools.lru_cache(maxsize=100000)
+def bigram_bits(name: str) -> int:
+    if not name:
+        return 0
+    padded = f"^{name}$"
+    bits = 0
+    for index in range(len(padded) - 1):
+        bits |= 1 << (zlib.crc32(padded[index:index + 2].encode()) & 63)
+    return bits
+
+
+def contact_key_rows(contact) -> list:
+    """
+    Вычисляет признаки контакта и строки временной таблицы для его ключей блоков.
+
+    Args:
+        contact (Row): Строка с колонками id, first_name, last_name, email, phone, birthday.
+
+    Returns:
+        list: Словари со значениями колонок dedupe_keys, по одному на ключ.
+    """
+    first_name = normalize_name(contact.first_name)
+    last_name = normalize_name(contact.last_name)
+    phone = normalize_phone(contact.phone)
+    email = normalize_email(contact.email)
+
+    keys = set()
+    if phone:
+        keys.add(f"p:{phone}")
+    if len(email) >= 3:
+        keys.add(f"e:{email}")
+    if first_name or last_name:
+        keys.add("n:" + "|".join(sorted((first_name, last_name))))
+        if contact.birthday is not None:
+            initials = "".join(sorted((first_name[:1], last_name[:1])))
+            keys.add(f"b:{contact.birthday.isoformat()}|{initials}")
+
+    features = {
+        "contact_id": contact.id,
+        "phone": phone,
+        "birthday": contact.birthday.toordinal() if contact.birthday is not None else 0,
+        "email": email,
+        "name_sketch": name_sketch(first_name, last_name),
+    }
+    return [dict(features, block_key=key) for key in sorted(keys)]
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def score_pairs(phone, birthday, email, sketch, left, right) -> np.ndarray:
+    """
+    Оценивает сходство пар контактов.
+
+    Телефон, email и день рождения сравниваются на равенство (пустые значения
+    не совпадают), имена - по доле общих битов набора биграмм.
+
+    Args:
+        phone (np.ndarray): Нормализованные телефоны, int64.
+        birthday (np.ndarray): Дни рождения как порядковые номера дат, int64.
+        email (np.ndarray): Хэши нормализованных email, int64; 0 - пустой email.
+        sketch (np.ndarray): Наборы биграмм имен, uint64.
+        left (np.ndarray): Индексы первых контактов пар.
+        right (np.ndarray): Индексы вторых контактов пар.
+
+    Returns:
+        np.ndarray: Оценки от 0 до 1.
+    """
+    union = popcount(sketch[left] | sketch[right]).astype(np.float64)
+    common = popcount(sketch[left] & sketch[right]).astype(np.float64)
+    name = np.divide(common, union, out=np.zeros(len(left)), where=union > 0)
+
+    score = WEIGHTS["name"] * name
+    for weight, values in ((WEIGHTS["phone"], phone), (WEIGHTS["email"], email), (WEIGHTS["birthday"], birthday)):
+        score += weight * ((values[left] == values[right]) & (values[left] != 0))
+    return score
+
+
+@functools.lru_cache(maxsize=None)
+def block_pairs(size: int) -> tuple:
+    return np.triu_indices(size, k=1)
+
+
+def score_chunk(rows, threshold: float, max_block_size: int, stats: dict) -> list:
+    """
+    Оценивает пары внутри блоков порции строк временной таблицы.
+
+    Args:
+        rows (List[Row]): Строки dedupe_keys в порядке (block_key, contact_id); блоки целые.
+        threshold (float): Минимальная оценка кандидата.
+        max_block_size (int): Блоки больше этого размера пропускаются.
+        stats (dict): Счетчики задачи; обновляются.
+
+    Returns:
+        list: Значения колонок ContactMergeCandidate.
+    """
+    block_key, contact_id, phone, birthday, email, sketch = (np.array(values) for values in zip(*rows))
+    # Границы блоков: позиции, где меняется ключ
+    bounds = np.flatnonzero(np.concatenate(([True], block_key[1:] != block_key[:-1], [True])))
+    starts, sizes = bounds[:-1], np.diff(bounds)
+    stats["skipped_blocks"] += int(np.count_nonzero(sizes > max_block_size))
+    compared = (sizes >= 2) & (sizes <= max_block_size)
+    stats["blocks"] += int(np.count_nonzero(compared))
+    left, right = [], []
+    for start, size in zip(starts[compared].tolist(), sizes[compared].tolist()):
+        block_left, block_right = block_pairs(size)
+        left.append(block_left + start)
+        right.append(block_right + start)
+    if not left:
+        return []
+    left, right = np.concatenate(left), np.concatenate(right)
+    stats["pairs"] += len(left)
+
+    email = np.fromiter((hash(value) if value else 0 for value in email), np.int64, len(email))
+    scores = score_pairs(phone, birthday, email, sketch.astype(np.int64).view(np.uint64), left, right)
+    keep = scores >= threshold
+    # Внутри блока контакты упорядочены по id, поэтому contact_id < duplicate_id
+    first, second, scores = contact_id[left[keep]], contact_id[right[keep]], scores[keep]
+    # Одна пара может попасть в порцию из нескольких блоков
+    _, unique = np.unique((first << 32) | second, return_index=True)
+    return [
+        {"contact_id": a, "duplicate_id": b, "score": round(score, 4)}
+        for a, b, score in zip(first[unique].tolist(), second[unique].tolist(), scores[unique].tolist())
+    ]
+
+
+def load_block_keys(connection, chunk_size: int, stats: dict):
+    columns = (Contact.id, Contact.first_name, Contact.last_name, Contact.email, Contact.phone, Contact.birthday)
+    after_id = 0
+    while True:
+        stmt = select(*columns).where(Contact.id > after_id).order_by(Contact.id).limit(chunk_size)
+        contacts = connection.execute(stmt).all()
+        if not contacts:
+            break
+        rows = [row for contact in contacts for row in contact_key_rows(contact)]
+        if rows:
+            connection.execute(insert(dedupe_keys), rows)
+        connection.commit()
+        stats["contacts"] += len(contacts)
+        stats["keys"] += len(rows)
+        after_id = contacts[-1].id
+
+
+def find_candidates(connection, chunk_size: int, threshold: float, max_block_size: int, stats: dict):
+    """
+    Читает временную таблицу порциями и записывает кандидатов.
+
+    Последний блок полной порции может продолжаться в следующей, поэтому он
+    откладывается и читается следующей порцией целиком.
+
+    Args:
+        connection (Connection): Соединение с временной таблицей dedupe_keys.
+        chunk_size (int): Размер порции; больше max_block_size.
+        threshold (float): Минимальная оценка кандидата.
+        max_block_size (int): Блоки больше этого размера пропускаются.
+        stats (dict): Счетчики задачи; обновляются.
+    """
+    order = (dedupe_keys.c.block_key, dedupe_keys.c.contact_id)
+    candidate_insert = insert_ignore[connection.dialect.name](ContactMergeCandidate).on_conflict_do_nothing(
+        index_elements=[ContactMergeCandidate.contact_id, ContactMergeCandidate.duplicate_id],
+    )
+    after = None
+    while True:
+        stmt = select(dedupe_keys).order_by(*order).limit(chunk_size)
+        if after is not None:
+            stmt = stmt.where(tuple_(*order) > after)
+        rows = connection.execute(stmt).all()
+        if not rows:
+            break
+        if len(rows) == chunk_size:
+            last_key = rows[-1].block_key
+            end = len(rows)
+            while end and rows[end - 1].block_key == last_key:
+                end -= 1
+            if end == 0:
+                # Вся порция - один блок, и он больше max_block_size
+                stats["skipped_blocks"] += 1
+                after = (last_key, MAX_CONTACT_ID)
+                continue
+            rows = rows[:end]
+        after = (rows[-1].block_key, rows[-1].contact_id)
+        candidates = score_chunk(rows, threshold, max_block_size, stats)
+        if candidates:
+            connection.execute(candidate_insert, candidates)
+        connection.commit()
+
+
+def run_dedupe(engine, chunk_size: int = DEFAULT_CHUNK_SIZE, threshold: float = DEFAULT_THRESHOLD,
+               max_block_size: int = DEFAULT_MAX_BLOCK_SIZE) -> dict:
+    """
+    Заново заполняет contact_merge_candidates.
+
+    Args:
+        engine (Engine): Движок основной базы.
+        chunk_size (int, optional): Сколько строк читать за запрос. Defaults to DEFAULT_CHUNK_SIZE.
+        threshold (float, optional): Минимальная оценка кандидата. Defaults to DEFAULT_THRESHOLD.
+        max_block_size (int, optional): Блоки больше этого размера пропускаются. Defaults to DEFAULT_MAX_BLOCK_SIZE.
+
+    Raises:
+        ValueError: Если chunk_size не больше max_block_size.
+
+    Returns:
+        dict: Количество контактов, ключей, блоков, пропущенных блоков, пар и кандидатов.
+    """
+    if chunk_size <= max_block_size:
+        raise ValueError("chunk_size must be greater than max_block_size")
+    stats = dict.fromkeys(("contacts", "keys", "blocks", "skipped_blocks", "pairs", "candidates"), 0)
+    with engine.connect() as connection:
+        connection.execute(delete(ContactMergeCandidate))
+        # CreateTable не создает индекс: он строится после загрузки, так быстрее
+        connection.execute(CreateTable(dedupe_keys))
+        try:
+            load_block_keys(connection, chunk_size, stats)
+            dedupe_keys_index.create(connection)
+            connection.commit()
+            find_candidates(connection, chunk_size, threshold, max_block_size, stats)
+        finally:
+            connection.rollback()
+            dedupe_keys.drop(connection)
+            connection.commit()
+        stats["candidates"] = connection.scalar(select(func.count()).select_from(ContactMergeCandidate))
+    return stats
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="строка подключения вместо DATABASE_URL")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--max-block-size", type=int, default=DEFAULT_MAX_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    settings = Settings()
+    if args.database_url:
+        settings = settings.copy(update={"database_url": args.database_url})
+    engine, _ = create_engines(settings)
+    started = time.perf_counter()
+    stats = run_dedupe(engine, args.chunk_size, args.threshold, args.max_block_size)
+    print(", ".join(f"{name}: {value}" for name, value in stats.items()))
+    print(f"Done in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main_cli()
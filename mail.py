@@ -1,17 +1,35 @@
+import logging
+import os
+import queue
 import smtplib
+import threading
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-def send_verification_email(email: str):
-    # Конфигурация SMTP сервера
-    smtp_host = "your_smtp_host"
-    smtp_port = 587  # Порт SMTP сервера
-    smtp_username = "your_username"
-    smtp_password = "your_password"
+logger = logging.getLogger(__name__)
+
+# Конфигурация SMTP сервера
+SMTP_HOST = os.environ.get("SMTP_HOST", "your_smtp_host")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", 587))  # Порт SMTP сервера
+SMTP_USERNAME = os.environ.get("SMTP_USERNAME", "your_username")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "your_password")
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "1") == "1"
+MAIL_FROM = "your_email@example.com"
+
+
+def build_verification_email(email: str) -> MIMEMultipart:
+    """
+    Создает письмо для подтверждения регистрации.
 
+    Args:
+        email (str): Адрес получателя.
+
+    Returns:
+        MIMEMultipart: Готовое к отправке письмо.
+    """
     # Создание объекта сообщения
     msg = MIMEMultipart()
-    msg["From"] = "your_email@example.com"
+    msg["From"] = MAIL_FROM
     msg["To"] = email
     msg["Subject"] = "Подтверждение регистрации"
 
@@ -26,9 +44,191 @@ def send_verification_email(email: str):
     Спасибо.
     """
     msg.attach(MIMEText(body, "plain"))
+    return msg
+
 
+def send_verification_email(email: str):
     # Подключение к SMTP серверу и отправка сообщения
-    with smtplib.SMTP(smtp_host, smtp_port) as server:
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        server.send_message(msg)
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
+        if SMTP_STARTTLS:
+            server.starttls()
+        server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        server.send_message(build_verification_email(email))
+
+
+class MailQueue:
+    """
+    Очередь исходящих писем с фоновым отправителем.
+
+    Отправитель держит одно авторизованное SMTP-соединение, забирает письма
+    пачками до batch_size и при ошибке повторяет отправку с экспоненциальной
+    задержкой. Соединение закрывается, если писем нет дольше idle_timeout.
+    Письма, ожидающие повтора, при остановке отправляются в последний раз.
+    """
+
+    _STOP = object()
+
+    def __init__(self, host: str, port: int, username: str = None, password: str = None,
+                 starttls: bool = True, batch_size: int = 50, max_attempts: int = 5,
+                 backoff: float = 1.0, idle_timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._smtp = None
+        # Отложенные повторы: таймер -> письмо и номер попытки
+        self._retries = {}
+        self._stopping = False
+
+    def enqueue(self, msg):
+        """
+        Ставит письмо в очередь и при необходимости запускает отправителя.
+
+        Args:
+            msg (Message): Письмо для отправки.
+        """
+        self.start()
+        self._queue.put((msg, 1))
+
+    def start(self):
+        """
+        Запускает фоновый поток отправителя, если он еще не запущен.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Отправляет уже поставленные в очередь письма и останавливает поток.
+
+        Письма, ожидающие повтора, отправляются сразу, без задержки; если и
+        эта попытка не удалась, письмо не отправляется.
+
+        Args:
+            timeout (float, optional): Максимальное время ожидания в секундах.
+        """
+        with self._lock:
+            self._stopping = True
+            for timer in self._retries:
+                timer.cancel()
+            retries = list(self._retries.values())
+            self._retries.clear()
+            thread = self._thread
+        for item in retries:
+            self._queue.put(item)
+        if thread is not None and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join(timeout)
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port)
+        if self.starttls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
+
+    def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _ensure_connected(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return
+            except (smtplib.SMTPException, OSError):
+                self._smtp = None
+        self._connect()
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._disconnect()
+                continue
+
+            batch = []
+            stop = item is self._STOP
+            if not stop:
+                batch.append(item)
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                self._send_batch(batch)
+            if stop:
+                self._disconnect()
+                return
+
+    def _send_batch(self, batch):
+        connected = False
+        for msg, attempt in batch:
+            try:
+                if not connected:
+                    self._ensure_connected()
+                    connected = True
+                self._smtp.send_message(msg)
+            except (smtplib.SMTPException, OSError):
+                connected = False
+                self._disconnect()
+                self._retry(msg, attempt)
+
+    def _retry(self, msg, attempt: int):
+        if attempt >= self.max_attempts:
+            logger.exception("Giving up on mail to %s after %d attempts", msg["To"], attempt)
+            return
+        delay = self.backoff * 2 ** (attempt - 1)
+        with self._lock:
+            if self._stopping:
+                # Поток отправителя завершается, отложенный повтор уже некому отправить
+                logger.error("Giving up on mail to %s: mail queue is stopping", msg["To"])
+                return
+            timer = threading.Timer(delay, lambda: self._requeue(timer))
+            timer.daemon = True
+            self._retries[timer] = (msg, attempt + 1)
+            timer.start()
+        logger.warning("Mail to %s failed, retrying in %.1fs", msg["To"], delay)
+
+    def _requeue(self, timer: threading.Timer):
+        with self._lock:
+            # Если stop() уже отменил таймер, письмо им же возвращено в очередь
+            item = self._retries.pop(timer, None)
+        if item is not None:
+            self._queue.put(item)
+
+
+mail_queue = MailQueue(SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, starttls=SMTP_STARTTLS)
+
+
+def enqueue_verification_email(email: str):
+    """
+    Ставит письмо для подтверждения регистрации в очередь отправки.
+
+    Args:
+        email (str): Адрес получателя.
+    """
+    mail_queue.enqueue(build_verification_email(email))
@@ -0,0 +1,230 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import event
+
+# Границы корзин гистограмм задержки в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Статистика SQL текущего запроса; заполняется событиями движка
+current_request_stats = contextvars.ContextVar("current_request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_time", "scope")
+
+    def __init__(self, scope=None):
+        self.statements = 0
+        self.db_time = 0.0
+        self.scope = scope
+
+
+# Соответствие функции-обработчика шаблону пути ее маршрута
+_route_templates = {}
+
+
+def route_template(scope) -> str:
+    """
+    Возвращает шаблон пути маршрута, обработавшего запрос.
+
+    Args:
+        scope (dict): ASGI scope запроса после маршрутизации.
+
+    Returns:
+        str: Шаблон пути, например /contacts/{contact_id}, или "unmatched".
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if endpoint not in _route_templates:
+        _route_templates.update(
+            (route.endpoint, route.path) for route in scope["app"].routes if hasattr(route, "endpoint")
+        )
+    return _route_templates.get(endpoint, "unmatched")
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    """
+    Метрики HTTP-запросов и пула соединений в текстовом формате Prometheus.
+
+    Все значения хранятся в памяти процесса; при нескольких воркерах
+    каждый отдает свои метрики, а суммирует их Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency = defaultdict(Histogram)
+        self.requests = defaultdict(int)
+        self.statements = defaultdict(int)
+        self.db_time = defaultdict(float)
+        self.pool_wait = defaultdict(Histogram)
+        self.pool_in_use = defaultdict(int)
+
+    def observe_request(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        with self._lock:
+            self.request_latency[(method, route)].observe(duration)
+            self.requests[(method, route, str(status))] += 1
+            self.statements[(method, route)] += stats.statements
+            self.db_time[(method, route)] += stats.db_time
+
+    def observe_pool_wait(self, engine_name: str, duration: float):
+        with self._lock:
+            self.pool_wait[(engine_name,)].observe(duration)
+
+    def change_pool_in_use(self, engine_name: str, delta: int):
+        with self._lock:
+            self.pool_in_use[(engine_name,)] += delta
+
+    def render(self) -> str:
+        """
+        Возвращает все метрики в текстовом формате Prometheus.
+
+        Returns:
+            str: Текст для ответа /metrics.
+        """
+        lines = []
+        with self._lock:
+            self._render_histogram(
+                lines, "http_request_duration_seconds", "Request latency by route template.",
+                ("method", "route"), self.request_latency)
+            self._render_values(
+                lines, "http_requests_total", "counter", "Requests by route template and status.",
+                ("method", "route", "status"), self.requests)
+            self._render_values(
+                lines, "db_statements_total", "counter", "SQL statements issued by route template.",
+                ("method", "route"), self.statements)
+            self._render_values(
+                lines, "db_statement_duration_seconds_total", "counter", "Time spent in SQL by route template.",
+                ("method", "route"), self.db_time)
+            self._render_histogram(
+                lines, "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.",
+                ("engine",), self.pool_wait)
+            self._render_values(
+                lines, "db_pool_connections_in_use", "gauge", "Connections currently checked out.",
+                ("engine",), self.pool_in_use)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _labels(names, values, extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}"
+
+    def _render_values(self, lines, name, kind, help_text, label_names, values):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in values.items():
+            lines.append(f"{name}{self._labels(label_names, labels)} {value}")
+
+    def _render_histogram(self, lines, name, help_text, label_names, histograms):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in histograms.items():
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{self._labels(label_names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(label_names, labels)} {histogram.sum}")
+            lines.append(f"{name}_count{self._labels(label_names, labels)} {cumulative}")
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware, которое записывает задержку, статус и SQL-статистику запроса.
+
+    Маршрут определяется по шаблону пути (например, /contacts/{contact_id}),
+    чтобы количество рядов метрик не зависело от идентификаторов в URL.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            current_request_stats.reset(token)
+            metrics.observe_request(scope["method"], route_template(scope), status_code, duration, stats)
+
+
+def instrument_engine(engine, name: str):
+    """
+    Подключает к движку SQLAlchemy подсчет SQL-запросов и метрики пула.
+
+    Args:
+        engine (Engine): Синхронный движок (для AsyncEngine - его sync_engine).
+        name (str): Имя движка в метках метрик.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_time += duration
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.change_pool_in_use(name, 1)
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        metrics.change_pool_in_use(name, -1)
+
+    # У пула нет события начала ожидания соединения, поэтому connect оборачивается
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            metrics.observe_pool_wait(name, time.perf_counter() - started)
+
+    pool.connect = timed_connect
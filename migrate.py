@@ -0,0 +1,143 @@
+"""
+Создает схему базы данных и обновляет уже существующую.
+
+Приложение при запуске не выполняет DDL, поэтому эту команду нужно запустить
+перед первым запуском и после добавления новых моделей. Недостающие таблицы
+создаются целиком, а в существующие таблицы шаги UPGRADE_STEPS добавляют новые
+колонки и индексы. Каждый шаг можно выполнять повторно. База берется из
+DATABASE_URL.
+
+Запуск:
+    python migrate.py
+    python migrate.py --database-url sqlite:///local.db
+"""
+import argparse
+
+from sqlalchemy import inspect, text
+
+from database import Base, create_engines, create_schema
+from models import CONTACT_SEARCH_DDL, NOTE_SEARCH_DDL, db_utcnow
+from settings import Settings
+
+
+def has_column(connection, table: str, column: str) -> bool:
+    return column in {item["name"] for item in inspect(connection).get_columns(table)}
+
+
+def add_birthday_key(connection):
+    """
+    Добавляет contacts.birthday_key (месяц * 100 + день) и заполняет его по birthday.
+    """
+    if not has_column(connection, "contacts", "birthday_key"):
+        connection.execute(text("ALTER TABLE contacts ADD COLUMN birthday_key INTEGER"))
+    if connection.dialect.name == "postgresql":
+        key = "EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday)"
+    else:
+        key = "CAST(strftime('%m', birthday) AS INTEGER) * 100 + CAST(strftime('%d', birthday) AS INTEGER)"
+    connection.execute(text(f"UPDATE contacts SET birthday_key = {key} WHERE birthday_key IS NULL"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_contacts_birthday_key ON contacts (birthday_key)"))
+
+
+def add_contact_updated_at(connection):
+    """
+    Добавляет contacts.updated_at для ленты изменений и индекс (updated_at, id).
+
+    Существующие контакты получают время миграции и один раз попадают в ленту.
+    """
+    now = db_utcnow().compile(dialect=connection.dialect)
+    if not has_column(connection, "contacts", "updated_at"):
+        if connection.dialect.name == "sqlite":
+            # SQLite добавляет колонку NOT NULL только с постоянным значением по умолчанию
+            connection.execute(text(
+                "ALTER TABLE contacts ADD COLUMN updated_at DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00.000000'"
+            ))
+            connection.execute(text(f"UPDATE contacts SET updated_at = {now}"))
+        else:
+            connection.execute(text("ALTER TABLE contacts ADD COLUMN updated_at TIMESTAMP WITHOUT TIME ZONE"))
+            connection.execute(text(f"UPDATE contacts SET updated_at = {now}"))
+            connection.execute(text("ALTER TABLE contacts ALTER COLUMN updated_at SET NOT NULL"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_contacts_updated_at_id ON contacts (updated_at, id)"))
+
+
+def add_search_ddl(connection, fts_table: str, statements: dict):
+    # Триггеры FTS5 видят только новые строки, поэтому новый индекс заполняется целиком
+    created = connection.dialect.name == "sqlite" and not inspect(connection).has_table(fts_table)
+    for statement in statements.get(connection.dialect.name, ()):
+        connection.exec_driver_sql(statement)
+    if created:
+        connection.exec_driver_sql(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def add_contact_search(connection):
+    """
+    Создает индексы поиска контактов: триграммные GIN в PostgreSQL, FTS5 в SQLite.
+    """
+    add_search_ddl(connection, "contacts_search", CONTACT_SEARCH_DDL)
+
+
+def add_note_search(connection):
+    """
+    Создает полнотекстовый поиск заметок: колонку search_vector и ее GIN-индекс
+    в PostgreSQL, FTS5 в SQLite.
+    """
+    add_search_ddl(connection, "notes_search", NOTE_SEARCH_DDL)
+
+
+def add_note_owner(connection):
+    """
+    Добавляет notes.owner_id. У существующих заметок владельца нет, и через API они не видны.
+    """
+    if not has_column(connection, "notes", "owner_id"):
+        connection.execute(text(
+            "ALTER TABLE notes ADD COLUMN owner_id INTEGER REFERENCES users (id) ON DELETE CASCADE"
+        ))
+
+
+def add_model_indexes(connection):
+    """
+    Создает индексы моделей (index=True и __table_args__), которых нет в существующих таблицах.
+    """
+    for model_table in Base.metadata.sorted_tables:
+        for index in model_table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+# Шаги обновления существующей схемы в порядке выполнения
+UPGRADE_STEPS = [
+    add_birthday_key,
+    add_contact_updated_at,
+    add_contact_search,
+    add_note_search,
+    add_note_owner,
+    add_model_indexes,
+]
+
+
+def upgrade_schema(engine):
+    """
+    Создает недостающие таблицы и выполняет шаги UPGRADE_STEPS в одной транзакции.
+
+    Args:
+        engine (Engine): Движок базы.
+    """
+    create_schema(engine)
+    with engine.begin() as connection:
+        for step in UPGRADE_STEPS:
+            step(connection)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="строка подключения вместо DATABASE_URL")
+    args = parser.parse_args()
+
+    settings = Settings()
+    if args.database_url:
+        settings = settings.copy(update={"database_url": args.database_url})
+    engine, _ = create_engines(settings)
+    upgrade_schema(engine)
+    print(f"Schema is up to date: {engine.url.render_as_string(hide_password=True)}")
+
+
+if __name__ == "__main__":
+    main_cli()
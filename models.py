@@ -1,24 +1,241 @@
-from sqlalchemy import Column, Integer, String, Date
-from sqlalchemy.ext.declarative import declarative_base
+from datetime import date
+from typing import Optional
 
-Base = declarative_base()
+from sqlalchemy import (
+    Boolean, Column, DDL, Date, DateTime, Float, ForeignKey, Index, Integer, String, UniqueConstraint, column, event,
+    literal_column, table,
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import validates
+from sqlalchemy.sql.expression import FunctionElement
+
+from database import Base
+
+
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, index=True)
+    hashed_password = Column(String)
+    is_active = Column(Boolean, default=True)
+    is_verified = Column(Boolean, default=False)
+    avatar_url = Column(String, nullable=True)
+
+
+class Avatar(Base):
+    __tablename__ = "avatars"
+
+    # SHA-256 содержимого файла: одинаковые изображения загружаются один раз
+    sha256 = Column(String(64), primary_key=True)
+    url = Column(String, nullable=False)
 
 
 class Note(Base):
     __tablename__ = 'notes'
+    # Страницы заметок пользователя выбираются по (owner_id, id)
+    __table_args__ = (Index("ix_notes_owner_id_id", "owner_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     content = Column(String, nullable=False)
+    # Владелец заметки; заметки, созданные до появления владельцев, через API не видны
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+
+
+# Конфигурация текстового поиска PostgreSQL; "simple" не зависит от языка заметок
+NOTE_SEARCH_CONFIG = "simple"
+
+# DDL полнотекстового поиска заметок по диалектам. Все команды идемпотентны: они
+# выполняются после создания таблицы и в migrate.py для уже существующей таблицы
+NOTE_SEARCH_DDL = {
+    # Вычисляемая колонка tsvector обновляется самой базой и индексируется GIN
+    "postgresql": (
+        "ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS "
+        f"(to_tsvector('{NOTE_SEARCH_CONFIG}', title || ' ' || content)) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_notes_search_vector ON notes USING gin (search_vector)",
+    ),
+    # Таблица FTS5 для того же поиска в SQLite при локальном запуске
+    "sqlite": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS notes_search USING fts5("
+        "title, content, content='notes', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS notes_search_ai AFTER INSERT ON notes BEGIN "
+        "INSERT INTO notes_search(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+        "CREATE TRIGGER IF NOT EXISTS notes_search_ad AFTER DELETE ON notes BEGIN "
+        "INSERT INTO notes_search(notes_search, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); END",
+        "CREATE TRIGGER IF NOT EXISTS notes_search_au AFTER UPDATE ON notes BEGIN "
+        "INSERT INTO notes_search(notes_search, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); "
+        "INSERT INTO notes_search(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    ),
+}
+for _dialect, _statements in NOTE_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Note.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+
+notes_search = table("notes_search", column("rowid"), column("rank"))
+# Колонка search_vector создается DDL выше и не входит в модель Note
+note_search_vector = literal_column("notes.search_vector")
+
+
+class db_utcnow(FunctionElement):
+    """
+    Текущее время UTC по часам базы данных.
+
+    Отметки времени для ленты изменений ставит база, а не хосты приложения:
+    расхождение часов между воркерами иначе переставляло бы записи местами.
+    """
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(db_utcnow, "postgresql")
+def _pg_utcnow(element, compiler, **kw):
+    # clock_timestamp, а не now(): now() - время начала транзакции, а не записи
+    return "(clock_timestamp() AT TIME ZONE 'utc')"
+
+
+@compiles(db_utcnow, "sqlite")
+def _sqlite_utcnow(element, compiler, **kw):
+    # SQLite сравнивает время как строку, поэтому формат совпадает с тем, что пишет SQLAlchemy
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+@compiles(db_utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+def get_birthday_key(birthday: Optional[date]) -> Optional[int]:
+    """
+    Возвращает ключ дня рождения в виде MMDD без учета года.
+
+    Args:
+        birthday (date, optional): Дата рождения.
+
+    Returns:
+        int: Ключ дня рождения, например 1231 для 31 декабря.
+    """
+    if birthday is None:
+        return None
+    return birthday.month * 100 + birthday.day
 
 
 class Contact(Base):
     __tablename__ = 'contacts'
 
     id = Column(Integer, primary_key=True, index=True)
-    first_name = Column(String(255), nullable=False)
-    last_name = Column(String(255), nullable=False)
-    email = Column(String(255), unique=True, nullable=False)
+    first_name = Column(String(255), nullable=False, index=True)
+    last_name = Column(String(255), nullable=False, index=True)
+    # Уникальность email проверяет база: на ней основаны ответы 400 при создании и обновлении
+    email = Column(String(255), unique=True, index=True, nullable=False)
     phone = Column(String(20), nullable=False)
     birthday = Column(Date, nullable=False)
     additional_info = Column(String, nullable=True)
+    # Месяц и день рождения в виде MMDD для поиска ближайших дней рождения по индексу
+    birthday_key = Column(Integer, index=True)
+    # Время последней записи (UTC) по часам базы; обновляется и запросами UPDATE без загрузки объекта
+    updated_at = Column(DateTime, nullable=False, default=db_utcnow(), onupdate=db_utcnow())
+
+    # Лента изменений читает контакты по возрастанию (updated_at, id)
+    __table_args__ = (Index("ix_contacts_updated_at_id", "updated_at", "id"),)
+
+    @validates("birthday")
+    def validate_birthday(self, key, value):
+        # Строку ISO 8601 ("2000-01-01") принимает драйвер PostgreSQL, но не SQLite и не get_birthday_key
+        if isinstance(value, str):
+            try:
+                value = date.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"Invalid birthday {value!r}: expected a date or an ISO 8601 string")
+        self.birthday_key = get_birthday_key(value)
+        return value
+
+
+def contact_values(data: dict) -> dict:
+    """
+    Дополняет данные контакта вычисляемыми колонками.
+
+    Запросы INSERT/UPDATE без загрузки объекта не вызывают validates,
+    поэтому birthday_key нужно передавать явно.
+
+    Args:
+        data (dict): Значения колонок контакта.
+
+    Returns:
+        dict: Значения колонок вместе с birthday_key, если передан birthday.
+    """
+    if "birthday" in data:
+        return dict(data, birthday_key=get_birthday_key(data["birthday"]))
+    return data
+
+
+# DDL поиска контактов по диалектам. Все команды идемпотентны: они выполняются
+# после создания таблицы и в migrate.py для уже существующей таблицы
+CONTACT_SEARCH_DDL = {
+    # Триграммные GIN-индексы для поиска подстроки (ILIKE '%q%') в PostgreSQL
+    "postgresql": (
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        *(
+            f"CREATE INDEX IF NOT EXISTS ix_contacts_{_field}_trgm ON contacts USING gin ({_field} gin_trgm_ops)"
+            for _field in ("first_name", "last_name", "email")
+        ),
+    ),
+    # Триграммный индекс FTS5 для того же поиска в SQLite при локальном запуске
+    "sqlite": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_search USING fts5("
+        "first_name, last_name, email, content='contacts', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS contacts_search_ai AFTER INSERT ON contacts BEGIN "
+        "INSERT INTO contacts_search(rowid, first_name, last_name, email) "
+        "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+        "CREATE TRIGGER IF NOT EXISTS contacts_search_ad AFTER DELETE ON contacts BEGIN "
+        "INSERT INTO contacts_search(contacts_search, rowid, first_name, last_name, email) "
+        "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); END",
+        "CREATE TRIGGER IF NOT EXISTS contacts_search_au AFTER UPDATE ON contacts BEGIN "
+        "INSERT INTO contacts_search(contacts_search, rowid, first_name, last_name, email) "
+        "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+        "INSERT INTO contacts_search(rowid, first_name, last_name, email) "
+        "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+    ),
+}
+for _dialect, _statements in CONTACT_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Contact.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+
+contacts_search = table("contacts_search", column("rowid"), column("rank"))
+
+
+class ContactTombstone(Base):
+    """
+    Отметка об удалении контакта для ленты изменений.
+
+    Сам контакт удаляется из contacts, поэтому остальные запросы и
+    уникальность email его не видят; здесь остаются только идентификатор и
+    время удаления.
+    """
+
+    __tablename__ = "contact_tombstones"
+    __table_args__ = (Index("ix_contact_tombstones_deleted_at_id", "deleted_at", "contact_id"),)
+
+    contact_id = Column(Integer, primary_key=True)
+    deleted_at = Column(DateTime, nullable=False, default=db_utcnow())
+
+
+class ContactMergeCandidate(Base):
+    """
+    Пара контактов, которые, возможно, описывают одного человека.
+
+    Таблицу заполняет пакетная задача dedupe.py; contact_id всегда меньше
+    duplicate_id.
+    """
+
+    __tablename__ = "contact_merge_candidates"
+    __table_args__ = (UniqueConstraint("contact_id", "duplicate_id"),)
+
+    id = Column(Integer, primary_key=True)
+    contact_id = Column(Integer, ForeignKey("contacts.id", ondelete="CASCADE"), nullable=False)
+    duplicate_id = Column(Integer, ForeignKey("contacts.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Оценка сходства от 0 до 1
+    score = Column(Float, nullable=False)
@@ -0,0 +1,117 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+
+# Количество процессов для bcrypt; 0 - хэширование в текущем потоке
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+# Сколько операций может ждать в очереди на каждый процесс
+PASSWORD_HASH_QUEUE_PER_WORKER = 4
+# Сколько синхронный обработчик ждет свободного места в очереди, в секундах
+PASSWORD_HASH_ACQUIRE_TIMEOUT = 1.0
+
+
+@functools.lru_cache(maxsize=None)
+def get_pwd_context():
+    # passlib и bcrypt загружаются при первом хэшировании, а не при импорте приложения
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+class PasswordPoolSaturated(Exception):
+    """
+    Очередь пула хэширования заполнена, запрос нужно повторить позже.
+    """
+
+
+class PasswordPool:
+    """
+    Ограниченный пул процессов для bcrypt.
+
+    Хэширование выполняется в отдельных процессах, поэтому не держит GIL
+    и цикл событий. Число одновременно принятых операций ограничено; если
+    очередь заполнена, вызов завершается ошибкой PasswordPoolSaturated.
+    """
+
+    def __init__(self, workers: int, max_pending: int, acquire_timeout: float):
+        self.workers = workers
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def submit(self, fn, *args, block: bool = True) -> Future:
+        """
+        Передает функцию в пул процессов.
+
+        Args:
+            fn (callable): Функция уровня модуля (должна сериализоваться pickle).
+            *args: Аргументы функции.
+            block (bool, optional): Ждать ли освобождения очереди до acquire_timeout.
+
+        Raises:
+            PasswordPoolSaturated: Если очередь пула заполнена.
+
+        Returns:
+            Future: Результат выполнения.
+        """
+        if not self._slots.acquire(blocking=block, timeout=self.acquire_timeout if block else None):
+            raise PasswordPoolSaturated()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        """
+        Выполняет функцию в пуле и ждет результата в текущем потоке.
+        """
+        if self.workers <= 0:
+            return fn(*args)
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn, *args):
+        """
+        Выполняет функцию в пуле, не блокируя цикл событий.
+
+        Если очередь заполнена, ошибка возникает сразу, без ожидания.
+        """
+        if self.workers <= 0:
+            return fn(*args)
+        return await asyncio.wrap_future(self.submit(fn, *args, block=False))
+
+    def shutdown(self):
+        """
+        Останавливает процессы пула.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+password_pool = PasswordPool(
+    PASSWORD_HASH_WORKERS,
+    max(PASSWORD_HASH_WORKERS, 1) * PASSWORD_HASH_QUEUE_PER_WORKER,
+    PASSWORD_HASH_ACQUIRE_TIMEOUT,
+)
@@ -0,0 +1,279 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import logging
+import marshal
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from metrics import current_request_stats, route_template
+
+logger = logging.getLogger("slow_query")
+
+# Токен для заголовка X-Profile; без него профилирование по заголовку отключено
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+# Доля запросов, профилируемых без заголовка (0.0 - 1.0)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+# Сколько последних профилей хранится в памяти
+PROFILE_STORE_SIZE = int(os.environ.get("PROFILE_STORE_SIZE", 50))
+# SQL-запросы дольше этого порога (в миллисекундах) попадают в журнал медленных запросов
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 200))
+# Сколько последних медленных запросов хранится в памяти
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("SLOW_QUERY_LOG_SIZE", 200))
+
+# Профилировщик текущего запроса, если запрос выбран для профилирования
+current_profiler = contextvars.ContextVar("current_profiler", default=None)
+# Профилировщик, включенный в цикле событий, записывает все корутины, поэтому
+# асинхронные обработчики профилируются по одному
+async_profile_lock = asyncio.Lock()
+
+
+def profile_token_matches(value: Optional[bytes]) -> bool:
+    # Сравнение за постоянное время не выдает токен по времени ответа
+    if not PROFILE_TOKEN or value is None:
+        return False
+    return hmac.compare_digest(value, PROFILE_TOKEN.encode())
+
+
+class ProfileStore:
+    """
+    Хранилище последних профилей запросов в формате pstats.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile_id: str, info: dict, profiler: cProfile.Profile):
+        profiler.create_stats()
+        data = marshal.dumps(profiler.stats)
+        with self._lock:
+            self._profiles[profile_id] = (info, data)
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+
+    def list(self) -> list:
+        with self._lock:
+            return [info for info, _ in reversed(self._profiles.values())]
+
+    def get(self, profile_id: str):
+        """
+        Возвращает профиль в формате файла pstats (.prof).
+
+        Args:
+            profile_id (str): Идентификатор профиля из заголовка X-Profile-Id.
+
+        Returns:
+            bytes: Содержимое .prof или None, если профиль не найден или вытеснен.
+        """
+        with self._lock:
+            item = self._profiles.get(profile_id)
+        return item[1] if item is not None else None
+
+    def render_text(self, profile_id: str, limit: int = 50):
+        data = self.get(profile_id)
+        if data is None:
+            return None
+        stats = pstats.Stats(_MarshalledStats(data), stream=io.StringIO())
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stats.stream.getvalue()
+
+
+class _MarshalledStats:
+    # pstats.Stats принимает объект с методом create_stats и атрибутом stats
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def create_stats(self):
+        self.stats = marshal.loads(self.data)
+
+
+profile_store = ProfileStore(PROFILE_STORE_SIZE)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware, которое выбирает запросы для профилирования.
+
+    Запрос профилируется, если в заголовке X-Profile передан PROFILE_TOKEN,
+    или случайно с вероятностью PROFILE_SAMPLE_RATE. Идентификатор профиля
+    возвращается в заголовке X-Profile-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _should_profile(self, scope) -> bool:
+        if PROFILE_TOKEN:
+            for name, value in scope["headers"]:
+                if name == b"x-profile" and profile_token_matches(value):
+                    return True
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        profiler = cProfile.Profile()
+        token = current_profiler.set(profiler)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profiler.reset(token)
+            profile_store.add(profile_id, {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route_template(scope),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "created_at": time.time(),
+            }, profiler)
+
+
+def profiled(endpoint):
+    """
+    Оборачивает обработчик так, чтобы он профилировался в своем потоке.
+
+    Синхронные обработчики FastAPI выполняет в пуле потоков, а cProfile
+    видит только поток, в котором включен, поэтому профилировщик
+    включается внутри самого обработчика. Асинхронные обработчики
+    профилируются по одному под async_profile_lock: иначе профили
+    одновременных запросов смешивались бы. В профиль асинхронного
+    обработчика все равно попадают непрофилируемые корутины, работавшие в
+    это время в том же цикле событий.
+
+    Args:
+        endpoint (callable): Функция-обработчик маршрута.
+
+    Returns:
+        callable: Обработчик с той же сигнатурой.
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profiler = current_profiler.get()
+            if profiler is None:
+                return await endpoint(*args, **kwargs)
+            async with async_profile_lock:
+                profiler.enable()
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    profiler.disable()
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profiler = current_profiler.get()
+        if profiler is None:
+            return endpoint(*args, **kwargs)
+        profiler.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profiler.disable()
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Маршрут, обработчик которого можно профилировать по запросу.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+class SlowQueryLog:
+    """
+    Журнал SQL-запросов, выполнявшихся дольше порога.
+    """
+
+    def __init__(self, threshold_ms: float, maxsize: int):
+        self.threshold_ms = threshold_ms
+        self._entries = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, parameters, duration_ms: float):
+        stats = current_request_stats.get()
+        scope = stats.scope if stats is not None else None
+        entry = {
+            "statement": statement,
+            "parameters": repr(parameters)[:1000],
+            "duration_ms": round(duration_ms, 3),
+            "route": route_template(scope) if scope is not None else None,
+            "method": scope["method"] if scope is not None else None,
+            "created_at": time.time(),
+        }
+        with self._lock:
+            self._entries.append(entry)
+        logger.warning("Slow query %.1f ms on %s %s: %s",
+                       duration_ms, entry["method"], entry["route"], statement)
+
+    def list(self) -> list:
+        with self._lock:
+            return list(reversed(self._entries))
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG_SIZE)
+
+
+def instrument_slow_queries(engine):
+    """
+    Подключает к движку запись медленных запросов в slow_query_log.
+
+    Args:
+        engine (Engine): Синхронный движок (для AsyncEngine - его sync_engine).
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["slow_query_started"].pop()) * 1000
+        if duration_ms >= slow_query_log.threshold_ms:
+            slow_query_log.record(statement, parameters, duration_ms)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("slow_query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def require_profile_token(x_profile: str = Header(None)):
+    """
+    Пропускает только запросы с PROFILE_TOKEN в заголовке X-Profile.
+
+    Raises:
+        HTTPException: Если токен не настроен или не совпадает.
+    """
+    # Header декодирует заголовок как latin-1, encode возвращает исходные байты
+    if not profile_token_matches(x_profile.encode("latin-1") if x_profile is not None else None):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Profiling token required")
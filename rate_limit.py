@@ -0,0 +1,354 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+# Максимальное количество корзин в памяти процесса
+RATE_LIMIT_MEMORY_SIZE = int(os.environ.get("RATE_LIMIT_MEMORY_SIZE", 100000))
+# Тело запроса больше этого размера не разбирается для ключа username
+RATE_LIMIT_MAX_BODY = 64 * 1024
+# Ключ общей корзины для запросов, из которых не удалось получить ключ клиента
+UNKNOWN_CLIENT = "*"
+
+
+class Rule(NamedTuple):
+    """
+    Правило ограничения: корзина на capacity запросов, которая полностью
+    наполняется за period секунд.
+    """
+
+    key: str
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+
+def parse_rules(spec: str) -> List[Rule]:
+    """
+    Разбирает правила вида "ip:20/60,username:5/60".
+
+    Args:
+        spec (str): Правила через запятую: ключ, количество запросов и период в секундах.
+
+    Raises:
+        ValueError: Если правило записано неверно или ключ неизвестен.
+
+    Returns:
+        List[Rule]: Правила.
+    """
+    rules = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        try:
+            key, limit = item.strip().split(":")
+            capacity, period = limit.split("/")
+            rule = Rule(key, int(capacity), float(period))
+        except ValueError:
+            raise ValueError(f"Invalid rate limit rule: {item!r}")
+        if rule.key not in CLIENT_KEYS or rule.capacity < 1 or rule.period <= 0:
+            raise ValueError(f"Invalid rate limit rule: {item!r}")
+        rules.append(rule)
+    return rules
+
+
+def refill(tokens: float, updated: float, rule: Rule, now: float) -> float:
+    return min(rule.capacity, tokens + (now - updated) * rule.rate)
+
+
+class MemoryBucketStore:
+    """
+    Корзины токенов в памяти процесса.
+
+    Каждый воркер uvicorn считает запросы отдельно. При переполнении
+    удаляются корзины, к которым дольше всего не обращались; удаленная
+    корзина снова считается полной.
+    """
+
+    blocking = False
+
+    def __init__(self, maxsize: int = RATE_LIMIT_MEMORY_SIZE, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rule: Rule) -> float:
+        """
+        Забирает токен из корзины ключа.
+
+        Args:
+            key (str): Ключ корзины.
+            rule (Rule): Правило, по которому наполняется корзина.
+
+        Returns:
+            float: 0, если токен получен, иначе сколько секунд ждать следующего токена.
+        """
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (rule.capacity, now))
+            tokens = refill(tokens, updated, rule, now)
+            if tokens < 1:
+                wait = (1 - tokens) / rule.rate
+            else:
+                tokens -= 1
+                wait = 0.0
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class SQLiteBucketStore:
+    """
+    Корзины токенов в файле SQLite, общие для всех воркеров на одном хосте.
+
+    Локальная замена общему хранилищу (например, Redis): каждый take
+    выполняется в транзакции BEGIN IMMEDIATE, поэтому воркеры не теряют
+    списания друг друга. Полные корзины периодически удаляются.
+    """
+
+    blocking = True
+
+    # Раз во сколько вызовов take удаляются полные корзины
+    prune_every = 1000
+
+    def __init__(self, path: str, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+        self._calls = 0
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Соединение SQLite нельзя использовать из разных потоков
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def take(self, key: str, rule: Rule) -> float:
+        """
+        Забирает токен из корзины ключа.
+
+        Args:
+            key (str): Ключ корзины.
+            rule (Rule): Правило, по которому наполняется корзина.
+
+        Returns:
+            float: 0, если токен получен, иначе сколько секунд ждать следующего токена.
+        """
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            row = connection.execute(
+                "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = rule.capacity if row is None else refill(row[0], row[1], rule, now)
+            if tokens < 1:
+                wait = (1 - tokens) / rule.rate
+            else:
+                tokens -= 1
+                wait = 0.0
+            connection.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, "
+                "updated = excluded.updated, full_at = excluded.full_at",
+                (key, tokens, now, now + (rule.capacity - tokens) / rule.rate),
+            )
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                # Отсутствующая корзина считается полной, поэтому полные можно удалить
+                connection.execute("DELETE FROM rate_limit_buckets WHERE full_at <= ?", (now,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+
+def create_bucket_store(path: Optional[str] = None):
+    """
+    Создает хранилище корзин.
+
+    Args:
+        path (str, optional): Файл SQLite, общий для воркеров. Defaults to память процесса.
+
+    Returns:
+        MemoryBucketStore | SQLiteBucketStore: Хранилище корзин.
+    """
+    if path:
+        return SQLiteBucketStore(path)
+    return MemoryBucketStore()
+
+
+def client_ip(scope, body: bytes) -> Optional[str]:
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+def client_username(scope, body: bytes) -> Optional[str]:
+    """
+    Возвращает имя пользователя из тела запроса.
+
+    Поддерживаются форма OAuth2 (/token, поле username) в кодировке
+    urlencoded или multipart и JSON (/users/, поле email).
+
+    Args:
+        scope (dict): ASGI scope запроса.
+        body (bytes): Тело запроса.
+
+    Returns:
+        str: Имя пользователя в нижнем регистре или None, если его нет.
+    """
+    header = dict(scope["headers"]).get(b"content-type", b"")
+    content_type = header.split(b";")[0].strip()
+    try:
+        if content_type == b"application/x-www-form-urlencoded":
+            username = parse_qs(body.decode()).get("username", [None])[0]
+        elif content_type == b"multipart/form-data":
+            username = multipart_field(header, body, "username")
+        elif content_type == b"application/json":
+            data = json.loads(body)
+            username = (data.get("username") or data.get("email")) if isinstance(data, dict) else None
+        else:
+            return None
+    except ValueError:
+        return None
+    return username.strip().lower() if isinstance(username, str) and username.strip() else None
+
+
+def multipart_field(content_type: bytes, body: bytes, name: str) -> Optional[str]:
+    """
+    Возвращает значение поля формы multipart/form-data.
+
+    Args:
+        content_type (bytes): Заголовок Content-Type с параметром boundary.
+        body (bytes): Тело запроса.
+        name (str): Имя поля.
+
+    Raises:
+        ValueError: Если тело не удалось декодировать.
+
+    Returns:
+        str: Значение поля или None, если поля нет.
+    """
+    message = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + content_type + b"\r\n\r\n" + body)
+    if not message.is_multipart():
+        return None
+    for part in message.iter_parts():
+        if part.get_param("name", header="content-disposition") == name and not part.get_filename():
+            return part.get_payload(decode=True).decode()
+    return None
+
+
+# Способы получить ключ клиента для правил
+CLIENT_KEYS = {
+    "ip": client_ip,
+    "username": client_username,
+}
+
+
+class RateLimitMiddleware:
+    """
+    ASGI-middleware, которое ограничивает частоту запросов корзинами токенов.
+
+    Правила задаются для маршрута ("POST /token") и ключа клиента (ip или
+    username); у каждой пары маршрут-ключ своя корзина. Запрос проходит,
+    только если токен нашелся во всех корзинах, иначе возвращается 429 с
+    заголовком Retry-After. Запросы, из которых ключ получить не удалось
+    (тело другого формата или слишком большое), списывают токен из общей
+    корзины правила, а не проходят без ограничения.
+    """
+
+    def __init__(self, app, rules: Dict[str, str], store=None):
+        self.app = app
+        self.rules = {}
+        for route, spec in rules.items():
+            method, path = route.split(" ", 1)
+            self.rules[(method.upper(), path)] = parse_rules(spec)
+        self.store = store if store is not None else MemoryBucketStore()
+
+    async def __call__(self, scope, receive, send):
+        rules = self.rules.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if not rules:
+            await self.app(scope, receive, send)
+            return
+
+        body = b""
+        if any(rule.key == "username" for rule in rules):
+            body, receive = await buffer_body(receive)
+
+        wait = 0.0
+        for rule in rules:
+            client_key = CLIENT_KEYS[rule.key](scope, body) or UNKNOWN_CLIENT
+            key = f"{scope['method']} {scope['path']}:{rule.key}:{client_key}"
+            if self.store.blocking:
+                wait = max(wait, await run_in_threadpool(self.store.take, key, rule))
+            else:
+                wait = max(wait, self.store.take(key, rule))
+
+        if wait > 0:
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+async def buffer_body(receive):
+    """
+    Читает тело запроса и возвращает receive, который отдает его повторно.
+
+    Тело больше RATE_LIMIT_MAX_BODY не разбирается: возвращается пустое
+    тело, а обработчик все равно получает запрос целиком.
+
+    Args:
+        receive (callable): ASGI receive.
+
+    Returns:
+        tuple: Тело запроса и новый receive.
+    """
+    messages = []
+    size = 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        size += len(message.get("body", b""))
+        if not message.get("more_body", False) or size > RATE_LIMIT_MAX_BODY:
+            break
+
+    async def replay():
+        if messages:
+            return messages.pop(0)
+        return await receive()
+
+    complete = messages[-1]["type"] == "http.request" and not messages[-1].get("more_body", False)
+    body = b"".join(message.get("body", b"") for message in messages) if complete else b""
+    return body, replay
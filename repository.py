@@ -1,52 +1,226 @@
-from models import Note
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+
+from models import NOTE_SEARCH_CONFIG, Contact, Note, note_search_vector, notes_search
+from sqlalchemy import delete, func, insert, literal_column, or_, select, update
 from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String
-from sqlalchemy.ext.declarative import declarative_base
 
-Base = declarative_base()
+# Сколько строк отправляется в базу одним запросом в bulk-операциях
+BULK_BATCH_SIZE = 1000
+# Длина фрагмента текста заметки в списках и результатах поиска
+NOTE_SNIPPET_LENGTH = 200
+
+
+def chunked(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
-class Contact(Base):
-    __tablename__ = 'contacts'
 
-    id = Column(Integer, primary_key=True, index=True)
-    first_name = Column(String)
-    last_name = Column(String)
-    email = Column(String, unique=True, index=True)
-    phone = Column(String)
-    birthday = Column(String)
-    additional_info = Column(String)
 class NoteRepository:
-    def __init__(self, session: Session):
+    """
+    Заметки поверх сессии базы данных.
+
+    Репозиторий с owner_id работает только с заметками этого пользователя:
+    новые заметки получают его owner_id, а чужие заметки не читаются, не
+    изменяются и не удаляются. Без owner_id доступны все заметки.
+    """
+
+    def __init__(self, session: Session, owner_id: Optional[int] = None):
         self.session = session
+        self.owner_id = owner_id
+        self._transaction_depth = 0
+
+    def _owned(self, stmt):
+        return stmt if self.owner_id is None else stmt.where(Note.owner_id == self.owner_id)
+
+    def _owns(self, note: Optional[Note]) -> Optional[Note]:
+        if note is None or self.owner_id is None or note.owner_id == self.owner_id:
+            return note
+        return None
 
+    def _with_owner(self, values: dict) -> dict:
+        return values if self.owner_id is None else {**values, "owner_id": self.owner_id}
 
+    @contextmanager
+    def transaction(self):
+        """
+        Объединяет несколько операций репозитория в одну транзакцию.
+
+        Внутри блока методы не фиксируют изменения сами: коммит выполняется
+        один раз при выходе из внешнего блока, при исключении - откат.
+
+        Yields:
+            NoteRepository: Этот же репозиторий.
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.session.rollback()
+            raise
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0:
+            self.session.commit()
+
+    def _commit(self):
+        if self._transaction_depth == 0:
+            self.session.commit()
+        else:
+            self.session.flush()
 
     def create_contact(self, contact: Contact):
         self.session.add(contact)
-        self.session.commit()
-        self.session.refresh(contact)
+        self._commit()
 
     def create_note(self, **note_data):
-        note = Note(**note_data)
+        note = Note(**self._with_owner(note_data))
         self.session.add(note)
-        self.session.commit()
+        self._commit()
         return note
 
     def get_note_by_id(self, note_id):
-        return self.session.query(Note).get(note_id)
+        return self._owns(self.session.get(Note, note_id))
+
+    def get_many(self, ids: Iterable[int]) -> List[Note]:
+        """
+        Возвращает заметки по списку идентификаторов одним запросом IN.
+
+        Args:
+            ids (Iterable[int]): Идентификаторы заметок.
+
+        Returns:
+            List[Note]: Найденные заметки в порядке ids; отсутствующие пропускаются.
+        """
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        for batch in chunked(ids, BULK_BATCH_SIZE):
+            stmt = self._owned(select(Note).where(Note.id.in_(batch)))
+            found.update((note.id, note) for note in self.session.scalars(stmt))
+        return [found[note_id] for note_id in ids if note_id in found]
+
+    def list_summaries(self, limit: int, after_id: Optional[int] = None) -> list:
+        """
+        Возвращает страницу заметок без полного текста.
+
+        Страница выбирается по ключу (id > after_id), поэтому ее стоимость
+        не растет с номером страницы; из текста читается только начало.
+
+        Args:
+            limit (int): Размер страницы.
+            after_id (int, optional): Идентификатор последней заметки предыдущей страницы.
+
+        Returns:
+            list: Строки с полями id, title и snippet.
+        """
+        stmt = self._owned(select(
+            Note.id, Note.title, func.substr(Note.content, 1, NOTE_SNIPPET_LENGTH).label("snippet")
+        ).order_by(Note.id))
+        if after_id is not None:
+            stmt = stmt.where(Note.id > after_id)
+        return self.session.execute(stmt.limit(limit)).all()
+
+    def search(self, query: str, limit: int) -> list:
+        """
+        Ищет заметки по словам в заголовке и тексте.
+
+        В PostgreSQL используется GIN-индекс по tsvector и сортировка по
+        ts_rank, в SQLite - таблица FTS5 и сортировка по рангу bm25.
+
+        Args:
+            query (str): Слова для поиска; должны встречаться все.
+            limit (int): Максимальное количество результатов.
+
+        Returns:
+            list: Строки с полями id, title и snippet, самые релевантные первыми.
+        """
+        if not query.split():
+            return []
+        dialect = self.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            tsquery = func.plainto_tsquery(NOTE_SEARCH_CONFIG, query)
+            snippet = func.ts_headline(
+                NOTE_SEARCH_CONFIG, Note.content, tsquery, "StartSel=, StopSel=, MaxWords=35, MinWords=15"
+            )
+            stmt = select(Note.id, Note.title, snippet.label("snippet")).where(
+                note_search_vector.op("@@")(tsquery)
+            ).order_by(func.ts_rank(note_search_vector, tsquery).desc(), Note.id)
+        elif dialect == "sqlite":
+            terms = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+            snippet = func.snippet(literal_column("notes_search"), 1, "", "", "...", 32)
+            stmt = select(Note.id, Note.title, snippet.label("snippet")).join(
+                notes_search, notes_search.c.rowid == Note.id
+            ).where(
+                literal_column("notes_search").op("MATCH")(terms)
+            ).order_by(notes_search.c.rank, Note.id)
+        else:
+            pattern = f"%{query}%"
+            stmt = select(
+                Note.id, Note.title, func.substr(Note.content, 1, NOTE_SNIPPET_LENGTH).label("snippet")
+            ).where(or_(Note.title.ilike(pattern), Note.content.ilike(pattern))).order_by(Note.id)
+        return self.session.execute(self._owned(stmt).limit(limit)).all()
 
     def create(self, note):
+        if self.owner_id is not None:
+            note.owner_id = self.owner_id
         self.session.add(note)
-        self.session.commit()
+        self._commit()
 
     def read(self, note_id):
-        return self.session.query(Note).get(note_id)
+        return self._owns(self.session.get(Note, note_id))
 
     def update(self, note):
-        self.session.commit()
+        self._commit()
 
     def delete(self, note):
         self.session.delete(note)
-        self.session.commit()
+        self._commit()
+
+    def bulk_create(self, notes: List[dict]) -> List[int]:
+        """
+        Создает заметки одним INSERT на пачку без загрузки объектов.
+
+        Args:
+            notes (List[dict]): Значения колонок новых заметок.
+
+        Returns:
+            List[int]: Идентификаторы созданных заметок в порядке notes.
+        """
+        ids = []
+        notes = [self._with_owner(note) for note in notes]
+        for batch in chunked(notes, BULK_BATCH_SIZE):
+            ids.extend(self.session.scalars(insert(Note).returning(Note.id, sort_by_parameter_order=True), batch))
+        self._commit()
+        return ids
+
+    def bulk_update(self, notes: List[dict]):
+        """
+        Обновляет заметки по первичному ключу одним UPDATE на пачку.
+
+        Args:
+            notes (List[dict]): Значения колонок; в каждом словаре должен быть id.
+        """
+        if self.owner_id is not None:
+            # UPDATE по первичному ключу не принимает дополнительных условий, поэтому чужие заметки отбрасываются
+            owned = {note.id for note in self.get_many(note["id"] for note in notes)}
+            notes = [note for note in notes if note["id"] in owned]
+        for batch in chunked(notes, BULK_BATCH_SIZE):
+            self.session.execute(update(Note), batch)
+        self._commit()
+
+    def bulk_delete(self, ids: Iterable[int]) -> int:
+        """
+        Удаляет заметки одним DELETE ... WHERE id IN (...) на пачку.
 
+        Args:
+            ids (Iterable[int]): Идентификаторы заметок.
 
+        Returns:
+            int: Количество удаленных заметок.
+        """
+        deleted = 0
+        for batch in chunked(list(ids), BULK_BATCH_SIZE):
+            deleted += self.session.execute(self._owned(delete(Note).where(Note.id.in_(batch)))).rowcount
+        self._commit()
+        return deleted
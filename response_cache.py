@@ -0,0 +1,210 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response
+
+from cache_versions import LocalVersions, SQLiteVersions
+
+# Максимальное количество закэшированных ответов
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 10000))
+# Время жизни ответа в секундах
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 30))
+# Общий счетчик всех групп: его увеличивает clear
+ALL_RESPONSES = "response:*"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Возвращает сильный ETag для тела ответа.
+
+    Args:
+        body (bytes): Сериализованное тело ответа.
+
+    Returns:
+        str: ETag в кавычках.
+    """
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Проверяет, совпадает ли ETag с заголовком If-None-Match.
+
+    Args:
+        if_none_match (str, optional): Значение заголовка If-None-Match.
+        etag (str): Текущий ETag ответа.
+
+    Returns:
+        bool: True, если у клиента актуальная версия ответа.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def conditional_response(request: Request, entry: CachedResponse) -> Response:
+    """
+    Возвращает 304, если у клиента актуальная версия, иначе тело ответа.
+
+    Args:
+        request (Request): Входящий запрос.
+        entry (CachedResponse): Сериализованный ответ.
+
+    Returns:
+        Response: Ответ с заголовком ETag.
+    """
+    headers = {"ETag": entry.etag, **entry.headers}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """
+    Ограниченный LRU-кэш сериализованных ответов.
+
+    Ответ сохраняется в группе (например, один контакт или все страницы
+    списка контактов), и у каждой группы свой счетчик инвалидаций в
+    versions. invalidate(group) увеличивает счетчики перечисленных групп,
+    clear - общий счетчик всех групп. Ответ отдается, только пока счетчики
+    его группы не изменились с момента его сохранения, поэтому запись
+    одного контакта не сбрасывает закэшированные остальные. Ответ,
+    построенный по данным, прочитанным до инвалидации, не сохраняется: set
+    получает version(group), снятую до запроса к базе, и пропускает запись,
+    если она изменилась. Если задан settle, ответы группы не сохраняются
+    еще settle секунд после ее инвалидации: при чтении из реплики они могут
+    отражать отставшие данные. Выключенный кэш (enabled=False) ничего не
+    хранит.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, settle: float = 0.0, versions=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.settle = settle
+        self.versions = versions if versions is not None else LocalVersions()
+        self.enabled = True
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def version(self, group: str) -> Tuple[int, int]:
+        """
+        Возвращает счетчики инвалидаций группы.
+
+        Args:
+            group (str): Группа ответов.
+
+        Returns:
+            Tuple[int, int]: Общий счетчик и счетчик группы.
+        """
+        everyone, own = self.versions.current(ALL_RESPONSES, group)
+        return everyone[0], own[0]
+
+    def get(self, key: str, group: Optional[str] = None) -> Optional[CachedResponse]:
+        """
+        Возвращает сохраненный ответ.
+
+        Args:
+            key (str): Ключ ответа.
+            group (str, optional): Группа ответа. Defaults to сам ключ.
+
+        Returns:
+            CachedResponse: Ответ или None, если его нет или он устарел.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            item = self._entries.get(key)
+        if item is None:
+            return None
+        entry, expires_at, entry_version = item
+        # Счетчики читаются без блокировки: SQLiteVersions может обратиться к файлу
+        if expires_at <= time.monotonic() or entry_version != self.version(group or key):
+            with self._lock:
+                if self._entries.get(key) is item:
+                    del self._entries[key]
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, body: bytes, headers: Dict[str, str], version: Tuple[int, int],
+            group: Optional[str] = None) -> CachedResponse:
+        """
+        Сохраняет ответ, если данные группы не менялись с момента version.
+
+        Args:
+            key (str): Ключ ответа.
+            body (bytes): Сериализованное тело ответа.
+            headers (Dict[str, str]): Дополнительные заголовки ответа.
+            version (Tuple[int, int]): Значение version(group) до чтения данных из базы.
+            group (str, optional): Группа ответа. Defaults to сам ключ.
+
+        Returns:
+            CachedResponse: Ответ с вычисленным ETag.
+        """
+        entry = CachedResponse(body, make_etag(body), headers)
+        if not self.enabled:
+            return entry
+        everyone, own = self.versions.current(ALL_RESPONSES, group or key)
+        invalidated_at = max(everyone[1], own[1])
+        if version != (everyone[0], own[0]) or time.time() - invalidated_at < self.settle:
+            return entry
+        with self._lock:
+            # Инвалидация после проверки не страшна: get сверит version записи со счетчиками
+            self._entries[key] = (entry, time.monotonic() + self.ttl, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, *groups: str):
+        """
+        Делает устаревшими ответы групп.
+
+        Args:
+            groups (str): Группы ответов; ответ, сохраненный без группы, - это его ключ.
+        """
+        self.versions.bump(*groups)
+        with self._lock:
+            for group in groups:
+                self._entries.pop(group, None)
+
+    def clear(self):
+        self.versions.bump(ALL_RESPONSES)
+        with self._lock:
+            self._entries.clear()
+
+
+def create_response_cache(storage: Optional[str] = None, workers: int = 1, settle: float = 0.0) -> ResponseCache:
+    """
+    Создает кэш ответов приложения со счетчиком инвалидаций для числа воркеров.
+
+    Args:
+        storage (str, optional): Файл SQLite для общих счетчиков воркеров. Defaults to None.
+        workers (int, optional): Число воркеров uvicorn. Defaults to 1.
+        settle (float, optional): Сколько секунд после инвалидации не сохранять ответы. Defaults to 0.
+
+    Returns:
+        ResponseCache: Кэш ответов.
+    """
+    cache = ResponseCache(
+        RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, settle, SQLiteVersions(storage) if storage else LocalVersions(),
+    )
+    # Без общего счетчика воркеры отдавали бы ответы, устаревшие после записи в другом воркере
+    cache.enabled = bool(storage) or workers <= 1
+    return cache
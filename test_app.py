@@ -0,0 +1,296 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import create_app
+from settings import Settings
+
+
+def test_create_app_does_not_touch_database(tmp_path):
+    # Приложение создается и отвечает, хотя файла базы еще нет
+    database_path = tmp_path / "app.db"
+    app = create_app(Settings(database_url=f"sqlite:///{database_path}"))
+    assert not database_path.exists()
+    assert TestClient(app).get("/metrics").status_code == 200
+
+
+def test_create_app_with_schema(tmp_path):
+    app = create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True))
+    client = TestClient(app)
+
+    response = client.post("/contacts/", json={
+        "first_name": "Factory",
+        "last_name": "Test",
+        "email": "factory.test@example.com",
+        "phone": "123456789",
+        "birthday": "2000-01-01",
+    })
+    assert response.status_code == 201
+    assert client.get(f"/contacts/{response.json()['id']}").status_code == 200
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_contact_rows_match_response_model(tmp_path, monkeypatch, use_orjson):
+    import main
+
+    if not use_orjson:
+        monkeypatch.setattr(main, "orjson", None)
+    client = TestClient(create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True)))
+    client.post("/contacts/", json={
+        "first_name": "Ёлка",
+        "last_name": "Test",
+        "email": "rows.test@example.com",
+        "phone": "123456789",
+        "birthday": "2000-02-29",
+    })
+
+    response = client.get("/contacts/")
+    contacts = [main.ContactInDB.parse_obj(contact) for contact in response.json()]
+    assert response.content == main.render_json(contacts)
+
+
+def test_sparse_fieldsets(tmp_path):
+    client = TestClient(create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True)))
+    contact_id = client.post("/contacts/", json={
+        "first_name": "Sparse",
+        "last_name": "Test",
+        "email": "sparse.test@example.com",
+        "phone": "123456789",
+        "birthday": "2000-01-01",
+    }).json()["id"]
+
+    assert client.get(f"/contacts/{contact_id}?fields=first_name").json() == {"id": contact_id, "first_name": "Sparse"}
+    assert client.get("/contacts/?fields=email,first_name").json() == [
+        {"id": contact_id, "first_name": "Sparse", "email": "sparse.test@example.com"},
+    ]
+    assert client.get("/contacts/search/?query=Sparse&fields=last_name").json() == [
+        {"id": contact_id, "last_name": "Test"},
+    ]
+    # Полный ответ не подменяется закэшированным ответом с частью полей
+    assert client.get(f"/contacts/{contact_id}").json()["email"] == "sparse.test@example.com"
+    assert client.get("/contacts/?fields=password").status_code == 400
+
+
+def test_contact_changes_feed(tmp_path):
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True, changes_settle_seconds=0)
+    client = TestClient(create_app(settings))
+    ids = [
+        client.post("/contacts/", json={
+            "first_name": f"Feed{i}",
+            "last_name": "Test",
+            "email": f"feed{i}@example.com",
+            "phone": "123456789",
+            "birthday": "2000-01-01",
+        }).json()["id"]
+        for i in range(3)
+    ]
+
+    first = client.get("/contacts/changes?limit=2").json()
+    assert [change["id"] for change in first["changes"]] == ids[:2]
+    assert first["has_more"]
+    second = client.get(f"/contacts/changes?since={first['cursor']}").json()
+    assert [change["contact"]["first_name"] for change in second["changes"]] == ["Feed2"]
+    assert not second["has_more"]
+
+    client.put(f"/contacts/{ids[0]}", json={"phone": "987654321"})
+    client.delete(f"/contacts/{ids[1]}")
+    client.post("/contacts/bulk/delete", json={"ids": [ids[2]]})
+    changes = client.get(f"/contacts/changes?since={second['cursor']}").json()["changes"]
+    assert [(change["id"], change["deleted"]) for change in changes] == [(ids[0], False), (ids[1], True), (ids[2], True)]
+    assert changes[0]["contact"]["phone"] == "987654321"
+    assert changes[1]["contact"] is None
+
+    assert client.get("/contacts/changes?since=broken").status_code == 400
+
+
+def test_rate_limited_response_has_cors_headers(tmp_path):
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", rate_limits={"POST /token": "ip:1/60"})
+    client = TestClient(create_app(settings))
+    headers = {"Origin": "http://localhost"}
+
+    assert client.post("/token", data={}, headers=headers).status_code == 422
+    response = client.post("/token", data={}, headers=headers)
+    assert response.status_code == 429
+    assert response.headers["access-control-allow-origin"] == "http://localhost"
+
+
+def test_token_over_multipart_is_limited_by_username(tmp_path):
+    settings = Settings(
+        database_url=f"sqlite:///{tmp_path / 'app.db'}",
+        create_schema=True,
+        rate_limits={"POST /token": "username:2/60"},
+    )
+    client = TestClient(create_app(settings))
+    form = {"username": (None, "Victim@example.com"), "password": (None, "wrong")}
+
+    for _ in range(2):
+        assert client.post("/token", files=form).status_code == 401
+    # Та же корзина, что и у формы urlencoded: смена кодировки не дает новых попыток
+    assert client.post("/token", data={"username": "victim@example.com", "password": "wrong"}).status_code == 429
+    assert client.post("/token", files=form).status_code == 429
+
+
+def seed_contacts(client, count):
+    for i in range(count):
+        response = client.post("/contacts/", json={
+            "first_name": f"Export{i}",
+            "last_name": "Test",
+            "email": f"export{i}@example.com",
+            "phone": "123456789",
+            "birthday": "2000-01-01",
+            "additional_info": "line, with \"quotes\"",
+        })
+        assert response.status_code == 201
+
+
+def test_export_ndjson_streams_all_contacts(tmp_path, monkeypatch):
+    import main
+
+    # Маленькие пачки: выгрузка отдается несколькими частями, а не одним телом
+    monkeypatch.setattr(main, "EXPORT_CHUNK_SIZE", 2)
+    client = TestClient(create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True)))
+    seed_contacts(client, 5)
+
+    # TestClient собирает тело целиком, поэтому части проверяются на самом генераторе
+    assert len(list(main.iter_contacts_export("ndjson", client.app.state.session_factory))) == 3
+
+    response = client.get("/contacts/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="contacts.ndjson"'
+    contacts = [json.loads(line) for line in response.text.splitlines()]
+    assert [contact["email"] for contact in contacts] == [f"export{i}@example.com" for i in range(5)]
+    assert list(contacts[0]) == main.EXPORT_FIELDS
+    assert contacts[0]["birthday"] == "2000-01-01"
+
+
+def test_export_csv_has_header(tmp_path):
+    import main
+
+    client = TestClient(create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True)))
+    seed_contacts(client, 2)
+
+    response = client.get("/contacts/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == main.EXPORT_FIELDS
+    assert [row[3] for row in rows[1:]] == ["export0@example.com", "export1@example.com"]
+    assert rows[1][6] == "line, with \"quotes\""
+
+
+def test_export_rejects_unknown_format(tmp_path):
+    client = TestClient(create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True)))
+    assert client.get("/contacts/export", params={"format": "xml"}).status_code == 400
+
+
+def import_row(i, **fields):
+    return {
+        "first_name": f"Import{i}",
+        "last_name": "Test",
+        "email": f"import{i}@example.com",
+        "phone": "123456789",
+        "birthday": "2000-01-01",
+        **fields,
+    }
+
+
+def test_import_ndjson_upserts_and_rejects_rows(tmp_path, monkeypatch):
+    import main
+
+    # Пачки по две строки: ошибки в одной строке не прерывают остальные пачки
+    monkeypatch.setattr(main, "IMPORT_BATCH_SIZE", 2)
+    client = TestClient(create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True)))
+    client.post("/contacts/", json=import_row(0))
+
+    lines = [
+        json.dumps(import_row(0, phone="555")),
+        "{not json",
+        json.dumps(import_row(1)),
+        json.dumps(import_row(2, birthday="not a date")),
+        json.dumps(import_row(3)),
+        json.dumps(import_row(1, last_name="Again")),
+    ]
+    response = client.post("/contacts/import", files={"file": ("contacts.ndjson", "\n".join(lines))})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["updated"], report["rejected"]) == (2, 2, 2)
+    assert [row["status"] for row in report["rows"]] == [
+        "updated", "rejected", "created", "rejected", "created", "updated",
+    ]
+    assert report["rows"][1] == {"row": 2, "status": "rejected", "email": None, "error": "Malformed row"}
+
+    contacts = {contact["email"]: contact for contact in client.get("/contacts/").json()}
+    assert sorted(contacts) == ["import0@example.com", "import1@example.com", "import3@example.com"]
+    assert contacts["import0@example.com"]["phone"] == "555"
+    assert contacts["import1@example.com"]["last_name"] == "Again"
+
+
+def test_import_csv(tmp_path):
+    client = TestClient(create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True)))
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(import_row(0)))
+    writer.writeheader()
+    writer.writerow(import_row(0))
+    writer.writerow(import_row(1, email="not-an-email"))
+
+    response = client.post(
+        "/contacts/import", params={"format": "csv"}, files={"file": ("contacts.csv", buffer.getvalue())},
+    )
+    assert response.status_code == 200
+    assert [row["status"] for row in response.json()["rows"]] == ["created", "rejected"]
+    assert [contact["email"] for contact in client.get("/contacts/").json()] == ["import0@example.com"]
+    assert client.post("/contacts/import", params={"format": "xml"}, files={"file": ("c.xml", "")}).status_code == 400
+
+
+def test_bulk_delete_rolls_back_all_chunks(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "BULK_CHUNK_SIZE", 2)
+    client = TestClient(
+        create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True)),
+        raise_server_exceptions=False,
+    )
+    seed_contacts(client, 5)
+    ids = [contact["id"] for contact in client.get("/contacts/").json()]
+
+    # Вторая пачка падает, и первая откатывается вместе с ней
+    tombstone_statement = main.tombstone_statement
+    calls = []
+
+    def failing_tombstone_statement(contact_ids, dialect):
+        calls.append(contact_ids)
+        if len(calls) == 2:
+            raise RuntimeError("chunk failed")
+        return tombstone_statement(contact_ids, dialect)
+
+    monkeypatch.setattr(main, "tombstone_statement", failing_tombstone_statement)
+    assert client.post("/contacts/bulk/delete", json={"ids": ids}).status_code == 500
+    assert [contact["id"] for contact in client.get("/contacts/").json()] == ids
+
+    monkeypatch.setattr(main, "tombstone_statement", tombstone_statement)
+    assert client.post("/contacts/bulk/delete", json={"ids": ids}).json() == {"affected": 5, "dry_run": False}
+    assert client.get("/contacts/").json() == []
+
+
+def test_delete_note_keeps_primary_cookie(tmp_path):
+    from main import PRIMARY_STICKY_COOKIE, User, create_access_token
+
+    database_url = f"sqlite:///{tmp_path / 'app.db'}"
+    settings = Settings(database_url=database_url, database_replica_url=database_url, create_schema=True)
+    app = create_app(settings)
+    with app.state.session_factory() as db:
+        db.add(User(email="notes@example.com", hashed_password="x"))
+        db.commit()
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token(data={'sub': 'notes@example.com'})}"
+    note_id = client.post("/notes/", json={"title": "Note", "content": "text"}).json()["id"]
+    client.cookies.clear()
+
+    response = client.delete(f"/notes/{note_id}")
+    assert response.status_code == 204
+    assert response.content == b""
+    assert PRIMARY_STICKY_COOKIE in response.cookies
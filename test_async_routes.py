@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import async_routes
+from main import create_app
+from settings import Settings
+
+CONTACT = {
+    "first_name": "Async",
+    "last_name": "Test",
+    "email": "async.test@example.com",
+    "phone": "123456789",
+    "birthday": "2000-01-01",
+    "additional_info": None,
+}
+
+
+@pytest.fixture
+def client(tmp_path):
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", db_mode="async", create_schema=True)
+    with TestClient(create_app(settings)) as client:
+        yield client
+
+
+def test_async_routes_take_precedence(client):
+    # Запрос обрабатывает первый подходящий маршрут
+    endpoints = {}
+    for route in client.app.routes:
+        for method in getattr(route, "methods", ()):
+            endpoints.setdefault((route.path, method), route.endpoint.__module__)
+    assert endpoints[("/contacts/", "POST")] == "async_routes"
+    assert endpoints[("/contacts/{contact_id:int}", "PUT")] == "async_routes"
+    assert endpoints[("/token", "POST")] == "async_routes"
+
+
+def test_contact_crud(client):
+    response = client.post("/contacts/", json=CONTACT)
+    assert response.status_code == 201
+    contact = response.json()
+    assert contact == {"id": contact["id"], **CONTACT}
+    assert client.post("/contacts/", json=CONTACT).status_code == 400
+
+    response = client.get(f"/contacts/{contact['id']}")
+    assert response.json() == contact
+    etag = response.headers["ETag"]
+    assert client.get(f"/contacts/{contact['id']}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/contacts/").json() == [contact]
+
+    response = client.put(f"/contacts/{contact['id']}", json={"first_name": "Changed"})
+    assert response.json() == {**contact, "first_name": "Changed"}
+    # Закэшированные контакт и список сбрасываются после изменения
+    assert client.get(f"/contacts/{contact['id']}").json()["first_name"] == "Changed"
+    assert client.get("/contacts/").json()[0]["first_name"] == "Changed"
+    assert client.put("/contacts/999", json={"first_name": "Nobody"}).status_code == 404
+
+    assert client.delete(f"/contacts/{contact['id']}").status_code == 200
+    assert client.get(f"/contacts/{contact['id']}").status_code == 404
+    assert client.get("/contacts/").json() == []
+    assert client.delete(f"/contacts/{contact['id']}").status_code == 404
+
+
+def test_create_user_and_token(client, monkeypatch):
+    sent = []
+    monkeypatch.setattr(async_routes, "enqueue_verification_email", sent.append)
+    credentials = {"email": "async.user@example.com", "password": "secret"}
+
+    response = client.post("/users/", json=credentials)
+    assert response.status_code == 201
+    assert response.json()["email"] == credentials["email"]
+    assert sent == [credentials["email"]]
+    assert client.post("/users/", json=credentials).status_code == 409
+
+    response = client.post("/token", data={"username": credentials["email"], "password": "secret"})
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+    response = client.post("/token", data={"username": credentials["email"], "password": "wrong"})
+    assert response.status_code == 401
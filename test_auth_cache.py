@@ -0,0 +1,105 @@
+import time
+
+from auth_cache import PrincipalCache
+from cache_versions import SQLiteVersions
+
+
+def test_hit_and_miss_counters():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    assert cache.get("token") is None
+    cache.set("token", "john@example.com", "user")
+    assert cache.get("token") == "user"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_respects_token_exp():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    cache.set("token", "john@example.com", "user", token_expires_at=time.time() - 1)
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_invalidate_removes_all_user_tokens():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    cache.set("token1", "john@example.com", "user")
+    cache.set("token2", "john@example.com", "user")
+    cache.set("token3", "jane@example.com", "other")
+    cache.invalidate("john@example.com")
+    assert cache.get("token1") is None
+    assert cache.get("token2") is None
+    assert cache.get("token3") == "other"
+
+
+def test_evicts_least_recently_used():
+    cache = PrincipalCache(maxsize=2, ttl=60)
+    cache.set("token1", "a@example.com", "a")
+    cache.set("token2", "b@example.com", "b")
+    cache.get("token1")
+    cache.set("token3", "c@example.com", "c")
+    assert cache.get("token2") is None
+    assert cache.get("token1") == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_set_skips_user_read_before_invalidation():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    version = cache.snapshot("john@example.com")
+    cache.invalidate("john@example.com")
+    cache.set("token", "john@example.com", "stale user", version=version)
+    assert cache.get("token") is None
+
+    # Изменение другого пользователя не мешает сохранить запись
+    version = cache.snapshot("john@example.com")
+    cache.invalidate("jane@example.com")
+    cache.set("token", "john@example.com", "user", version=version)
+    assert cache.get("token") == "user"
+
+
+def test_invalidation_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "versions.db")
+    first = PrincipalCache(maxsize=10, ttl=60, versions=SQLiteVersions(path, refresh=0))
+    second = PrincipalCache(maxsize=10, ttl=60, versions=SQLiteVersions(path, refresh=0))
+    first.set("token", "john@example.com", "user")
+    second.set("token", "john@example.com", "user")
+    second.set("other", "jane@example.com", "other")
+
+    first.invalidate("john@example.com")
+    assert second.get("token") is None
+    assert second.get("other") == "other"
+
+    second.set("token", "john@example.com", "user")
+    first.clear()
+    assert second.get("token") is None
+    assert second.get("other") is None
+
+
+def test_user_changes_invalidate_cache_after_commit(tmp_path):
+    from sqlalchemy import create_engine, update
+    from sqlalchemy.orm import Session
+
+    from database import Base
+    from main import User
+
+    principal_cache = PrincipalCache(maxsize=10, ttl=60)
+    engine = create_engine(f"sqlite:///{tmp_path / 'users.db'}")
+    Base.metadata.create_all(bind=engine, tables=[User.__table__])
+    with Session(engine, info={"principal_cache": principal_cache}) as db:
+        db.add(User(email="old@example.com", hashed_password="x"))
+        db.commit()
+        principal_cache.set("token", "old@example.com", "user")
+
+        user = db.query(User).one()
+        user.email = "new@example.com"
+        db.flush()
+        # До фиксации другой запрос еще видит старую строку
+        assert principal_cache.get("token") == "user"
+        db.commit()
+        # Токен закэширован под прежним email
+        assert principal_cache.get("token") is None
+
+        principal_cache.set("token", "new@example.com", "user")
+        db.execute(update(User).values(is_active=False))
+        db.commit()
+        assert principal_cache.get("token") is None
+    engine.dispose()
@@ -0,0 +1,126 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from avatars import AvatarPipeline, AvatarTooLarge, InvalidAvatar, LocalAvatarStorage, spool_upload, verify_image
+
+
+def test_spool_upload_hashes_content():
+    data = b"avatar" * 50000
+    digest, path = spool_upload(io.BytesIO(data))
+    try:
+        assert digest == hashlib.sha256(data).hexdigest()
+        with open(path, "rb") as f:
+            assert f.read() == data
+    finally:
+        os.remove(path)
+
+
+def test_spool_upload_rejects_large_files():
+    with pytest.raises(AvatarTooLarge):
+        spool_upload(io.BytesIO(b"x" * 100), max_bytes=10)
+
+
+def test_verify_image_rejects_broken_files(tmp_path):
+    image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    image.new("RGB", (40, 20), (0, 128, 255)).save(buffer, format="PNG")
+    valid = tmp_path / "valid.png"
+    valid.write_bytes(buffer.getvalue())
+    verify_image(str(valid))
+
+    for name, data in [("text.png", b"not an image"), ("truncated.png", buffer.getvalue()[:-20])]:
+        broken = tmp_path / name
+        broken.write_bytes(data)
+        with pytest.raises(InvalidAvatar):
+            verify_image(str(broken))
+
+
+def test_pipeline_uploads_original_and_variants(tmp_path):
+    image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    image.new("RGB", (400, 200), (0, 128, 255)).save(buffer, format="PNG")
+
+    storage = LocalAvatarStorage(str(tmp_path), "/media")
+    pipeline = AvatarPipeline(storage, sizes=(64,), workers=1)
+    digest, path = spool_upload(io.BytesIO(buffer.getvalue()))
+
+    pipeline.submit(digest, path).result()
+    pipeline.shutdown()
+
+    assert pipeline.url(digest) == f"/media/avatars/{digest}/original"
+    assert sorted(os.listdir(tmp_path / "avatars" / digest)) == ["64", "original"]
+    with image.open(tmp_path / "avatars" / digest / "64") as variant:
+        assert max(variant.size) == 64
+    # Временный файл удаляется после загрузки
+    assert not os.path.exists(path)
+
+
+@pytest.fixture
+def avatar_client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+    from main import User, create_app
+    from settings import Settings
+
+    spooled = []
+
+    def spool(file):
+        digest, path = spool_upload(file)
+        spooled.append(path)
+        return digest, path
+
+    monkeypatch.setattr(main, "spool_upload", spool)
+    monkeypatch.setattr(main, "verify_image", lambda path: None)
+    app = create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True))
+    with app.state.session_factory() as db:
+        db.add(User(id=1, email="avatar@example.com", hashed_password="x"))
+        db.commit()
+    yield TestClient(app), app, spooled
+
+
+def upload_avatar(client):
+    return client.put("/users/1/avatar", files={"avatar": ("avatar.png", b"not really a png", "image/png")})
+
+
+def test_avatar_spool_is_removed_when_commit_fails(avatar_client, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import Session
+
+    client, _, spooled = avatar_client
+
+    def commit(self):
+        raise OperationalError("COMMIT", {}, Exception("disk I/O error"))
+
+    monkeypatch.setattr(Session, "commit", commit)
+    with pytest.raises(OperationalError):
+        upload_avatar(client)
+    assert len(spooled) == 1
+    assert not os.path.exists(spooled[0])
+
+
+def test_avatar_returns_404_for_user_deleted_during_upload(avatar_client, monkeypatch):
+    from sqlalchemy import delete
+    from sqlalchemy.exc import IntegrityError
+    from sqlalchemy.orm import Session
+
+    from main import User
+
+    client, app, spooled = avatar_client
+    commit = Session.commit
+
+    def conflicting_commit(self):
+        # Другой запрос загрузил тот же файл, а пользователя тем временем удалили
+        monkeypatch.setattr(Session, "commit", commit)
+        with app.state.engine.begin() as connection:
+            connection.execute(delete(User))
+        raise IntegrityError("INSERT INTO avatars", {}, Exception("UNIQUE constraint failed"))
+
+    monkeypatch.setattr(Session, "commit", conflicting_commit)
+    response = upload_avatar(client)
+    assert response.status_code == 404
+    assert len(spooled) == 1
+    assert not os.path.exists(spooled[0])
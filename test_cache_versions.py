@@ -0,0 +1,31 @@
+from cache_versions import LocalVersions, SQLiteVersions
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_local_versions_count_per_key():
+    versions = LocalVersions()
+    versions.bump("a")
+    versions.bump("a", "b")
+    assert [version for version, _ in versions.current("a", "b", "c")] == [2, 1, 0]
+
+
+def test_sqlite_versions_refresh_reads(tmp_path):
+    path = str(tmp_path / "versions.db")
+    clock = FakeClock()
+    first = SQLiteVersions(path, refresh=1, clock=clock)
+    second = SQLiteVersions(path, refresh=1, clock=clock)
+    assert second.current("a")[0][0] == 0
+
+    first.bump("a")
+    # Свою инвалидацию воркер видит сразу, чужую - после refresh
+    assert first.current("a")[0][0] == 1
+    assert second.current("a")[0][0] == 0
+    clock.now += 1
+    assert second.current("a")[0][0] == 1
@@ -1,22 +1,26 @@
 import pytest
 from fastapi.testclient import TestClient
-from main import app
+from database import create_schema
+from main import app, get_db
 from repository import NoteRepository
 from models import Contact
-from database import engine, Base
 from sqlalchemy.orm import Session
+from datetime import date, timedelta
 
-Base.metadata.create_all(bind=engine)
 client = TestClient(app)
 
 
 @pytest.fixture(scope="module")
 def test_db():
-    connection = engine.connect()
+    create_schema(app.state.engine)
+    connection = app.state.engine.connect()
     transaction = connection.begin()
 
-    # Создаем сессию базы данных
-    session = Session(bind=connection)
+    # Создаем сессию базы данных; commit в ней фиксирует только точку сохранения
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+
+    # Маршруты работают в той же транзакции и видят созданные тестами данные
+    app.dependency_overrides[get_db] = lambda: session
 
     # Создаем репозиторий контактов
     contact_repository = NoteRepository(session)
@@ -24,6 +28,8 @@ def test_db():
     yield contact_repository
 
     # Откатываем транзакцию после завершения тестов
+    app.dependency_overrides.clear()
+    session.close()
     transaction.rollback()
     connection.close()
 
@@ -72,7 +78,7 @@ def test_read_contact(test_db):
     assert retrieved_contact["last_name"] == contact.last_name
     assert retrieved_contact["email"] == contact.email
     assert retrieved_contact["phone"] == contact.phone
-    assert retrieved_contact["birthday"] == contact.birthday
+    assert retrieved_contact["birthday"] == contact.birthday.isoformat()
     assert retrieved_contact["additional_info"] == contact.additional_info
 
 
@@ -103,5 +109,139 @@ def test_read_contact(test_db):
     assert retrieved_contact["last_name"] == contact.last_name
     assert retrieved_contact["email"] == contact.email
     assert retrieved_contact["phone"] == contact.phone
-    assert retrieved_contact["birthday"] == contact.birthday
+    assert retrieved_contact["birthday"] == contact.birthday.isoformat()
     assert retrieved_contact["additional_info"] == contact.additional_info
+
+
+def test_read_contacts_cursor(test_db):
+    # Создаем несколько контактов
+    for i in range(3):
+        client.post("/contacts/", json={
+            "first_name": "Page",
+            "last_name": f"Test{i}",
+            "email": f"page.test{i}@example.com",
+            "phone": "123456789",
+            "birthday": "2000-01-01",
+        })
+
+    # Проходим по страницам с помощью курсора
+    seen = []
+    response = client.get("/contacts/", params={"limit": 2})
+    while True:
+        assert response.status_code == 200
+        seen.extend(contact["id"] for contact in response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        response = client.get("/contacts/", params={"limit": 2, "cursor": next_cursor})
+
+    # Проверяем, что порядок стабильный и без повторов
+    assert seen == sorted(set(seen))
+
+
+def test_read_contacts_invalid_cursor(test_db):
+    response = client.get("/contacts/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_search_contacts_limit(test_db):
+    # Создаем контакты с общей подстрокой в имени
+    for i in range(3):
+        client.post("/contacts/", json={
+            "first_name": "Searchable",
+            "last_name": f"Person{i}",
+            "email": f"searchable{i}@example.com",
+            "phone": "123456789",
+            "birthday": "2000-01-01",
+        })
+
+    # Проверяем, что limit ограничивает выдачу
+    response = client.get("/contacts/search/", params={"query": "searchable", "limit": 2})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+def test_upcoming_birthdays_ignores_year(test_db):
+    # Контакт родился много лет назад, но день рождения через два дня
+    birthday = date.today() + timedelta(days=2)
+    client.post("/contacts/", json={
+        "first_name": "Birthday",
+        "last_name": "Soon",
+        "email": "birthday.soon@example.com",
+        "phone": "123456789",
+        "birthday": str(birthday.replace(year=1990)),
+    })
+
+    response = client.get("/contacts/upcoming_birthdays", params={"days": 7})
+    assert response.status_code == 200
+    assert "birthday.soon@example.com" in [contact["email"] for contact in response.json()]
+
+
+def test_read_contact_not_modified(test_db):
+    response = client.post("/contacts/", json={
+        "first_name": "Etag",
+        "last_name": "Test",
+        "email": "etag.test@example.com",
+        "phone": "123456789",
+        "birthday": "2000-01-01",
+    })
+    contact_id = response.json()["id"]
+
+    # Повторный запрос с тем же ETag возвращает 304 без тела
+    response = client.get(f"/contacts/{contact_id}")
+    etag = response.headers["ETag"]
+    response = client.get(f"/contacts/{contact_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # После изменения контакта ETag меняется
+    client.put(f"/contacts/{contact_id}", json={"first_name": "Changed"})
+    response = client.get(f"/contacts/{contact_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "Changed"
+
+
+def test_duplicate_email_rejected(test_db):
+    contact_data = {
+        "first_name": "Unique",
+        "last_name": "Email",
+        "email": "unique.email@example.com",
+        "phone": "123456789",
+        "birthday": "2000-01-01",
+    }
+    assert client.post("/contacts/", json=contact_data).status_code == 201
+
+    # Дубликат отклоняет уникальный индекс базы
+    response = client.post("/contacts/", json=contact_data)
+    assert response.status_code == 400
+
+    other = client.post("/contacts/", json=dict(contact_data, email="other.email@example.com")).json()
+    response = client.put(f"/contacts/{other['id']}", json={"email": contact_data["email"]})
+    assert response.status_code == 400
+
+    assert client.delete(f"/contacts/{other['id']}").status_code == 200
+    assert client.delete(f"/contacts/{other['id']}").status_code == 404
+
+
+def test_bulk_update_and_delete(test_db):
+    ids = []
+    for i in range(3):
+        response = client.post("/contacts/", json={
+            "first_name": "Bulkedit",
+            "last_name": f"Test{i}",
+            "email": f"bulk.edit{i}@example.com",
+            "phone": "123456789",
+            "birthday": "2000-01-01",
+        })
+        ids.append(response.json()["id"])
+
+    # Пробный запуск только считает контакты
+    response = client.post("/contacts/bulk/delete", json={"ids": ids, "dry_run": True})
+    assert response.json() == {"affected": 3, "dry_run": True}
+
+    response = client.post("/contacts/bulk/update", json={"query": "Bulkedit", "values": {"additional_info": "tagged"}})
+    assert response.json() == {"affected": 3, "dry_run": False}
+    assert client.get(f"/contacts/{ids[0]}").json()["additional_info"] == "tagged"
+
+    response = client.post("/contacts/bulk/delete", json={"ids": ids})
+    assert response.json() == {"affected": 3, "dry_run": False}
+    assert client.get(f"/contacts/{ids[0]}").status_code == 404
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, insert, select
+from sqlalchemy.orm import declarative_base
+
+from database import RoutingSession
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+@pytest.fixture
+def engines(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(bind=primary)
+    Base.metadata.create_all(bind=replica)
+    with replica.begin() as conn:
+        conn.execute(insert(Item).values(id=1, name="from replica"))
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def test_reads_go_to_replica(engines):
+    primary, replica = engines
+    with RoutingSession(primary=primary, replica=replica, use_replica=True) as db:
+        assert db.scalars(select(Item.name)).all() == ["from replica"]
+
+
+def test_reads_stay_on_primary_without_replica_flag(engines):
+    primary, replica = engines
+    with RoutingSession(primary=primary, replica=replica) as db:
+        assert db.scalars(select(Item.name)).all() == []
+
+
+def test_session_sticks_to_primary_after_write(engines):
+    primary, replica = engines
+    with RoutingSession(primary=primary, replica=replica, use_replica=True) as db:
+        db.add(Item(id=2, name="written"))
+        db.commit()
+        assert db.scalars(select(Item.name)).all() == ["written"]
+
+    with replica.connect() as conn:
+        assert conn.scalars(select(Item.name)).all() == ["from replica"]
+
+
+def test_dml_goes_to_primary(engines):
+    primary, replica = engines
+    with RoutingSession(primary=primary, replica=replica, use_replica=True) as db:
+        db.execute(insert(Item).values(id=3, name="inserted"))
+        db.commit()
+    with primary.connect() as conn:
+        assert conn.scalars(select(Item.name)).all() == ["inserted"]
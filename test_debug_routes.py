@@ -0,0 +1,86 @@
+import pstats
+
+import pytest
+from fastapi.testclient import TestClient
+
+import profiling
+from main import create_app
+from settings import Settings
+
+DEBUG_PATHS = ["/debug/profiles", "/debug/profiles/missing", "/debug/slow-queries", "/auth/cache-stats"]
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True))
+    return TestClient(app)
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    return {"X-Profile": "secret"}
+
+
+def test_metrics_are_public(client):
+    client.get("/contacts/")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert '# TYPE http_requests_total counter' in response.text
+    assert 'http_requests_total{method="GET",route="/contacts/",status="200"}' in response.text
+
+
+def test_debug_routes_are_disabled_without_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", None)
+    for path in DEBUG_PATHS:
+        response = client.get(path, headers={"X-Profile": ""})
+        assert response.status_code == 403, path
+    # Без настроенного токена запросы не профилируются
+    assert "X-Profile-Id" not in client.get("/contacts/", headers={"X-Profile": ""}).headers
+
+
+def test_debug_routes_require_token(client, token):
+    for path in DEBUG_PATHS:
+        assert client.get(path).status_code == 403, path
+        assert client.get(path, headers={"X-Profile": "wrong"}).status_code == 403, path
+    assert "X-Profile-Id" not in client.get("/contacts/", headers={"X-Profile": "wrong"}).headers
+    assert client.get("/auth/cache-stats", headers=token).status_code == 200
+
+
+def test_download_profile(client, token, tmp_path):
+    profile_id = client.get("/contacts/", headers=token).headers["X-Profile-Id"]
+
+    listed = [item for item in client.get("/debug/profiles", headers=token).json() if item["id"] == profile_id]
+    assert len(listed) == 1
+
+    response = client.get(f"/debug/profiles/{profile_id}", headers=token)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["content-disposition"] == f'attachment; filename="{profile_id}.prof"'
+    # Скачанный файл открывается pstats, как в snakeviz
+    path = tmp_path / "request.prof"
+    path.write_bytes(response.content)
+    assert pstats.Stats(str(path)).total_calls > 0
+
+    response = client.get(f"/debug/profiles/{profile_id}", params={"format": "text"}, headers=token)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "cumulative" in response.text
+
+    for fmt in ["prof", "text"]:
+        response = client.get("/debug/profiles/missing", params={"format": fmt}, headers=token)
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Profile not found"}
+
+
+def test_slow_queries(client, token, monkeypatch):
+    monkeypatch.setattr(profiling.slow_query_log, "threshold_ms", 0)
+    client.get("/contacts/")
+
+    response = client.get("/debug/slow-queries", headers=token)
+    assert response.status_code == 200
+    entries = [entry for entry in response.json() if entry["route"] == "/contacts/"]
+    assert entries and entries[0]["method"] == "GET"
+    assert "contacts" in entries[0]["statement"]
@@ -0,0 +1,72 @@
+from datetime import date
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, insert, select
+
+from database import create_schema
+from dedupe import DEFAULT_THRESHOLD, name_sketch, normalize_email, normalize_name, normalize_phone, run_dedupe, score_pairs
+from models import Contact, ContactMergeCandidate, contact_values
+
+
+def test_normalize():
+    assert normalize_name(" Пётр-Иванович ") == "петриванович"
+    assert normalize_name("José") == "jose"
+    assert normalize_phone("+7 (912) 345-67-89") == normalize_phone("8 912 345 67 89") == 9123456789
+    assert normalize_phone("12-34") == 0
+    assert normalize_email("Ivan.Petrov+news@gmail.com") == normalize_email("ivanpetrov@yandex.ru")
+
+
+def test_score_pairs():
+    sketches = [name_sketch("ivan", "petrov"), name_sketch("petrov", "ivan"), name_sketch("anna", "smith")]
+    sketch = np.array(sketches, dtype=np.int64).view(np.uint64)
+    phone = np.array([9123456789, 9123456789, 9123456789], dtype=np.int64)
+    birthday = np.zeros(3, dtype=np.int64)
+    email = np.array([1, 2, 0], dtype=np.int64)
+    left, right = np.array([0, 0]), np.array([1, 2])
+
+    scores = score_pairs(phone, birthday, email, sketch, left, right)
+
+    # Имя и фамилия, записанные в другом порядке, совпадают полностью
+    assert scores[0] == pytest.approx(0.6)
+    assert scores[1] < DEFAULT_THRESHOLD
+
+
+def contact(index, first_name, last_name, phone, birthday=date(1990, 5, 17)):
+    return contact_values({
+        "first_name": first_name,
+        "last_name": last_name,
+        "email": f"user{index}@example.com",
+        "phone": phone,
+        "birthday": birthday,
+    })
+
+
+def test_run_dedupe(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dedupe.db'}")
+    create_schema(engine)
+    contacts = [
+        contact(1, "Ivan", "Petrov", "+7 912 345-67-89"),
+        contact(2, "ivan", "PETROV", "89123456789"),
+        contact(3, "Petrov", "Ivan", "000", date(1990, 5, 17)),
+        contact(4, "Anna", "Smith", "+7 912 345-67-89", date(1985, 1, 2)),
+    ]
+    # Общий телефон организации: блок больше max_block_size пропускается
+    contacts += [contact(10 + i, f"Name{i}", f"Surname{i}", "+1 555 000 0000", date(1970, 1, 1 + i)) for i in range(8)]
+    with engine.begin() as connection:
+        connection.execute(insert(Contact), contacts)
+
+    stats = run_dedupe(engine, chunk_size=7, max_block_size=5)
+
+    with engine.connect() as connection:
+        pairs = connection.execute(
+            select(ContactMergeCandidate.contact_id, ContactMergeCandidate.duplicate_id)
+            .order_by(ContactMergeCandidate.contact_id, ContactMergeCandidate.duplicate_id)
+        ).all()
+    assert [tuple(pair) for pair in pairs] == [(1, 2), (1, 3), (2, 3)]
+    assert stats["contacts"] == 12
+    assert stats["candidates"] == 3
+    assert stats["skipped_blocks"] == 1
+
+    # Повторный запуск заменяет кандидатов, а не добавляет
+    assert run_dedupe(engine, chunk_size=7, max_block_size=5)["candidates"] == 3
@@ -0,0 +1,108 @@
+import socket
+import time
+
+import pytest
+
+from mail import MailQueue, build_verification_email
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+class RecordingHandler:
+    # Обработчик локального SMTP-сервера, который складывает письма в память
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=get_free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_mail_queue_sends_batch(smtp_server):
+    controller, handler = smtp_server
+    mail_queue = MailQueue(controller.hostname, controller.port, starttls=False)
+
+    for i in range(5):
+        mail_queue.enqueue(build_verification_email(f"user{i}@example.com"))
+    mail_queue.stop(timeout=5)
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in handler.messages) == [
+        f"user{i}@example.com" for i in range(5)
+    ]
+
+
+def test_mail_queue_retries_until_server_is_up():
+    port = get_free_port()
+    mail_queue = MailQueue("127.0.0.1", port, starttls=False, backoff=0.2)
+
+    # Сервер еще не запущен, первая попытка отправки завершится ошибкой
+    mail_queue.enqueue(build_verification_email("late@example.com"))
+    time.sleep(0.1)
+
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        assert wait_for(lambda: handler.messages)
+    finally:
+        mail_queue.stop(timeout=5)
+        controller.stop()
+
+
+def test_mail_queue_stop_flushes_pending_retries():
+    port = get_free_port()
+    mail_queue = MailQueue("127.0.0.1", port, starttls=False, backoff=60)
+
+    # Первая попытка не удалась, следующая запланирована только через минуту
+    mail_queue.enqueue(build_verification_email("pending@example.com"))
+    assert wait_for(lambda: mail_queue._retries)
+    timer = next(iter(mail_queue._retries))
+
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        mail_queue.stop(timeout=5)
+    finally:
+        controller.stop()
+
+    assert [envelope.rcpt_tos[0] for envelope in handler.messages] == ["pending@example.com"]
+    assert not mail_queue._retries
+    timer.join(1)
+    assert not timer.is_alive()
+
+
+def test_mail_queue_stop_gives_up_on_failed_retries():
+    mail_queue = MailQueue("127.0.0.1", get_free_port(), starttls=False, backoff=60)
+
+    mail_queue.enqueue(build_verification_email("lost@example.com"))
+    assert wait_for(lambda: mail_queue._retries)
+    mail_queue.stop(timeout=5)
+
+    # Последняя попытка при остановке тоже не удалась, новых повторов не планируется
+    assert not mail_queue._thread.is_alive()
+    assert not mail_queue._retries
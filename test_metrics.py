@@ -0,0 +1,26 @@
+from metrics import Metrics, RequestStats
+
+
+def test_render_request_metrics():
+    metrics = Metrics()
+    stats = RequestStats()
+    stats.statements = 3
+    stats.db_time = 0.002
+    metrics.observe_request("GET", "/contacts/{contact_id}", 200, 0.02, stats)
+    metrics.observe_request("GET", "/contacts/{contact_id}", 404, 7.0, RequestStats())
+
+    text = metrics.render()
+
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/contacts/{contact_id}",le="0.025"} 1' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/contacts/{contact_id}",le="+Inf"} 2' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/contacts/{contact_id}"} 2' in text
+    assert 'http_requests_total{method="GET",route="/contacts/{contact_id}",status="404"} 1' in text
+    assert 'db_statements_total{method="GET",route="/contacts/{contact_id}"} 3' in text
+
+
+def test_pool_in_use_gauge():
+    metrics = Metrics()
+    metrics.change_pool_in_use("primary", 1)
+    metrics.change_pool_in_use("primary", 1)
+    metrics.change_pool_in_use("primary", -1)
+    assert 'db_pool_connections_in_use{engine="primary"} 1' in metrics.render()
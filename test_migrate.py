@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from migrate import upgrade_schema
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    # Схема до добавления новых колонок и индексов
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE contacts (id INTEGER PRIMARY KEY, first_name VARCHAR(255) NOT NULL, "
+            "last_name VARCHAR(255) NOT NULL, email VARCHAR(255) NOT NULL UNIQUE, "
+            "phone VARCHAR(20) NOT NULL, birthday DATE NOT NULL, additional_info VARCHAR)"
+        ))
+        conn.execute(text("CREATE TABLE notes (id INTEGER PRIMARY KEY, title VARCHAR(255) NOT NULL, content VARCHAR NOT NULL)"))
+        conn.execute(text("INSERT INTO notes (id, title, content) VALUES (1, 'Groceries', 'buy milk')"))
+        conn.execute(text(
+            "INSERT INTO contacts (id, first_name, last_name, email, phone, birthday) "
+            "VALUES (1, 'Anna', 'Smith', 'anna@example.com', '+7 900', '1990-12-05')"
+        ))
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_adds_birthday_key(legacy_engine):
+    upgrade_schema(legacy_engine)
+    upgrade_schema(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        assert conn.scalar(text("SELECT birthday_key FROM contacts WHERE id = 1")) == 1205
+    assert "ix_contacts_birthday_key" in {index["name"] for index in inspect(legacy_engine).get_indexes("contacts")}
+
+
+def test_upgrade_adds_contact_updated_at(legacy_engine):
+    upgrade_schema(legacy_engine)
+    upgrade_schema(legacy_engine)
+
+    columns = {column["name"]: column for column in inspect(legacy_engine).get_columns("contacts")}
+    assert not columns["updated_at"]["nullable"]
+    with legacy_engine.connect() as conn:
+        assert conn.scalar(text("SELECT updated_at FROM contacts WHERE id = 1")) > "2000"
+    indexes = {index["name"] for index in inspect(legacy_engine).get_indexes("contacts")}
+    assert "ix_contacts_updated_at_id" in indexes
+    assert inspect(legacy_engine).has_table("contact_tombstones")
+
+
+def test_upgrade_adds_contact_search(legacy_engine):
+    upgrade_schema(legacy_engine)
+    upgrade_schema(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        # Контакт, созданный до миграции, находится через FTS5
+        assert conn.scalars(text("SELECT rowid FROM contacts_search WHERE contacts_search MATCH 'Smi'")).all() == [1]
+    indexes = {index["name"] for index in inspect(legacy_engine).get_indexes("contacts")}
+    assert {"ix_contacts_first_name", "ix_contacts_last_name", "ix_contacts_email"} <= indexes
+
+
+def test_upgrade_adds_note_search(legacy_engine):
+    upgrade_schema(legacy_engine)
+    upgrade_schema(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        assert conn.scalars(text("SELECT rowid FROM notes_search WHERE notes_search MATCH 'milk'")).all() == [1]
+
+
+def test_upgrade_adds_note_owner(legacy_engine):
+    upgrade_schema(legacy_engine)
+    upgrade_schema(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        assert conn.scalar(text("SELECT owner_id FROM notes WHERE id = 1")) is None
+    assert "ix_notes_owner_id_id" in {index["name"] for index in inspect(legacy_engine).get_indexes("notes")}
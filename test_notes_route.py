@@ -0,0 +1,99 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from main import User, create_access_token, create_app
+from settings import Settings
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app(Settings(database_url=f"sqlite:///{tmp_path / 'app.db'}", create_schema=True))
+    with app.state.session_factory() as db:
+        db.add_all([
+            User(id=1, email="owner@example.com", hashed_password="x"),
+            User(id=2, email="other@example.com", hashed_password="x"),
+        ])
+        db.commit()
+    return TestClient(app)
+
+
+def auth(email):
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': email})}"}
+
+
+OWNER = auth("owner@example.com")
+OTHER = auth("other@example.com")
+
+
+def create_note(client, headers, title, content):
+    response = client.post("/notes/", json={"title": title, "content": content}, headers=headers)
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_notes_require_authentication(client):
+    assert client.get("/notes/").status_code == 401
+    assert client.post("/notes/", json={"title": "Note", "content": "text"}).status_code == 401
+    assert client.get("/notes/search/", params={"query": "text"}).status_code == 401
+    assert client.get("/notes/1").status_code == 401
+    assert client.delete("/notes/1").status_code == 401
+
+
+def test_note_crud(client):
+    note = create_note(client, OWNER, "Groceries", "buy milk")
+    assert note == {"id": note["id"], "title": "Groceries", "content": "buy milk"}
+
+    assert client.get(f"/notes/{note['id']}", headers=OWNER).json() == note
+    response = client.put(f"/notes/{note['id']}", json={"content": "buy bread"}, headers=OWNER)
+    assert response.json() == {**note, "content": "buy bread"}
+
+    response = client.delete(f"/notes/{note['id']}", headers=OWNER)
+    assert response.status_code == 204
+    assert client.get(f"/notes/{note['id']}", headers=OWNER).status_code == 404
+    assert client.delete(f"/notes/{note['id']}", headers=OWNER).status_code == 404
+
+
+def test_other_users_notes_are_not_found(client):
+    note = create_note(client, OWNER, "Secret", "private text")
+    create_note(client, OTHER, "Public", "other text")
+
+    assert client.get(f"/notes/{note['id']}", headers=OTHER).status_code == 404
+    assert client.put(f"/notes/{note['id']}", json={"title": "Stolen"}, headers=OTHER).status_code == 404
+    assert client.delete(f"/notes/{note['id']}", headers=OTHER).status_code == 404
+    assert [item["title"] for item in client.get("/notes/", headers=OTHER).json()] == ["Public"]
+    assert client.get("/notes/search/", params={"query": "private"}, headers=OTHER).json() == []
+
+    # Заметка не изменилась и не удалилась
+    assert client.get(f"/notes/{note['id']}", headers=OWNER).json() == note
+
+
+def test_list_notes_pages_by_cursor(client):
+    ids = [create_note(client, OWNER, f"Note {i}", "x" * 500)["id"] for i in range(3)]
+
+    response = client.get("/notes/", params={"limit": 2}, headers=OWNER)
+    first_page = response.json()
+    assert [item["id"] for item in first_page] == ids[:2]
+    # В списке только начало текста
+    assert first_page[0]["snippet"] == "x" * 200
+    assert "content" not in first_page[0]
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/notes/", params={"limit": 2, "cursor": cursor}, headers=OWNER)
+    assert [item["id"] for item in response.json()] == ids[2:]
+    assert "X-Next-Cursor" not in response.headers
+    assert client.get("/notes/", params={"cursor": "broken"}, headers=OWNER).status_code == 400
+
+
+def test_search_notes(client):
+    groceries = create_note(client, OWNER, "Groceries", "buy milk and bread")
+    create_note(client, OWNER, "Work", "send the report")
+    create_note(client, OWNER, "Dairy", "milk is in the fridge")
+
+    response = client.get("/notes/search/", params={"query": "milk bread"}, headers=OWNER)
+    assert response.status_code == 200
+    results = response.json()
+    assert [item["id"] for item in results] == [groceries["id"]]
+    assert "milk" in results[0]["snippet"]
+    results = client.get("/notes/search/", params={"query": "milk"}, headers=OWNER).json()
+    assert {item["title"] for item in results} == {"Groceries", "Dairy"}
+    assert client.get("/notes/search/", params={"query": ""}, headers=OWNER).status_code == 422
@@ -0,0 +1,29 @@
+import time
+
+import pytest
+
+from passwords import PasswordPool, PasswordPoolSaturated, check_password, hash_password
+
+
+@pytest.fixture
+def pool():
+    pool = PasswordPool(workers=1, max_pending=1, acquire_timeout=0.1)
+    yield pool
+    pool.shutdown()
+
+
+def test_hash_and_verify_in_pool(pool):
+    hashed = pool.run(hash_password, "secret")
+    assert pool.run(check_password, "secret", hashed)
+    assert not pool.run(check_password, "wrong", hashed)
+
+
+def test_pool_rejects_when_saturated(pool):
+    # Единственное место в очереди занято долгой операцией
+    future = pool.submit(time.sleep, 0.5)
+    with pytest.raises(PasswordPoolSaturated):
+        pool.submit(time.sleep, 0, block=False)
+    with pytest.raises(PasswordPoolSaturated):
+        pool.submit(time.sleep, 0)
+    future.result()
+    assert pool.submit(time.sleep, 0).result() is None
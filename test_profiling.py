@@ -0,0 +1,37 @@
+import asyncio
+import cProfile
+
+import pytest
+from fastapi import HTTPException
+
+import profiling
+from profiling import current_profiler, profiled, require_profile_token
+
+
+def test_async_handlers_are_profiled_one_at_a_time():
+    running = []
+
+    @profiled
+    async def endpoint(name):
+        running.append(name)
+        await asyncio.sleep(0.01)
+        assert running == [name]
+        running.remove(name)
+        return name
+
+    async def profiled_request(name):
+        current_profiler.set(cProfile.Profile())
+        return await endpoint(name)
+
+    async def main():
+        return await asyncio.gather(profiled_request("first"), profiled_request("second"))
+
+    assert asyncio.run(main()) == ["first", "second"]
+
+
+def test_require_profile_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    require_profile_token("secret")
+    for value in [None, "", "secret2", "wrong"]:
+        with pytest.raises(HTTPException):
+            require_profile_token(value)
@@ -0,0 +1,90 @@
+import pytest
+from fastapi import FastAPI, Form, Request
+from fastapi.testclient import TestClient
+
+from rate_limit import MemoryBucketStore, RateLimitMiddleware, Rule, SQLiteBucketStore, parse_rules
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_rules():
+    assert parse_rules("ip:20/60, username:5/60") == [Rule("ip", 20, 60.0), Rule("username", 5, 60.0)]
+    with pytest.raises(ValueError):
+        parse_rules("cookie:5/60")
+    with pytest.raises(ValueError):
+        parse_rules("ip:5")
+
+
+@pytest.mark.parametrize("store_class", ["memory", "sqlite"])
+def test_token_bucket_refills(tmp_path, store_class):
+    clock = FakeClock()
+    if store_class == "memory":
+        store = MemoryBucketStore(clock=clock)
+    else:
+        store = SQLiteBucketStore(str(tmp_path / "buckets.db"), clock=clock)
+    rule = Rule("ip", 2, 10.0)
+
+    assert store.take("a", rule) == 0
+    assert store.take("a", rule) == 0
+    assert store.take("a", rule) == pytest.approx(5.0)
+    # Корзины разных ключей независимы
+    assert store.take("b", rule) == 0
+
+    clock.now += 5
+    assert store.take("a", rule) == 0
+    assert store.take("a", rule) == pytest.approx(5.0)
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    # Два хранилища на одном файле - как два воркера uvicorn
+    path = str(tmp_path / "buckets.db")
+    first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    rule = Rule("ip", 1, 60.0)
+    assert first.take("a", rule) == 0
+    assert second.take("a", rule) > 0
+
+
+def test_middleware_limits_by_username():
+    app = FastAPI()
+
+    @app.post("/token")
+    def token(username: str = Form(...)):
+        return {"username": username}
+
+    app.add_middleware(RateLimitMiddleware, rules={"POST /token": "username:2/60"})
+    client = TestClient(app)
+
+    for _ in range(2):
+        response = client.post("/token", data={"username": "User@example.com"})
+        assert response.json() == {"username": "User@example.com"}
+    response = client.post("/token", data={"username": "user@example.com"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    assert client.post("/token", data={"username": "other@example.com"}).status_code == 200
+
+
+def test_middleware_limits_multipart_and_unknown_bodies():
+    app = FastAPI()
+
+    @app.post("/token")
+    async def token(request: Request):
+        return {"size": len(await request.body())}
+
+    app.add_middleware(RateLimitMiddleware, rules={"POST /token": "username:1/60"})
+    client = TestClient(app)
+
+    # Форма multipart считается по имени пользователя так же, как urlencoded
+    assert client.post("/token", data={"username": "user@example.com"}).status_code == 200
+    response = client.post("/token", files={"username": (None, "User@example.com")})
+    assert response.status_code == 429
+    assert client.post("/token", files={"username": (None, "other@example.com")}).status_code == 200
+
+    # Тело, из которого имя не получить, списывает токен из общей корзины
+    assert client.post("/token", content=b"???", headers={"Content-Type": "text/plain"}).status_code == 200
+    assert client.post("/token", files={"password": (None, "secret")}).status_code == 429
@@ -1,12 +1,16 @@
 import unittest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
+from sqlalchemy import create_engine, func, select
+from database import create_schema
 from main import app, get_db
-from models import Contact
+from models import Contact, Note
+from repository import NoteRepository
 
 
 class TestContactAPI(unittest.TestCase):
     def setUp(self):
+        create_schema(app.state.engine)
         self.client = TestClient(app)
         self.db = Session()
 
@@ -35,5 +39,62 @@ class TestContactAPI(unittest.TestCase):
         self.assertEqual(created_contact["additional_info"], contact_data["additional_info"])
 
 
+class TestNoteRepository(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Note.__table__.create(bind=self.engine)
+        self.db = Session(bind=self.engine)
+        self.repository = NoteRepository(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def count_notes(self):
+        return self.db.scalar(select(func.count()).select_from(Note))
+
+    def test_transaction_commits_once(self):
+        with self.repository.transaction():
+            self.repository.create_note(title="First", content="a")
+            self.repository.create_note(title="Second", content="b")
+            self.assertTrue(self.db.in_transaction())
+        self.assertEqual(self.count_notes(), 2)
+
+    def test_transaction_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.repository.transaction():
+                self.repository.create_note(title="Lost", content="a")
+                raise RuntimeError()
+        self.assertEqual(self.count_notes(), 0)
+
+    def test_bulk_operations(self):
+        ids = self.repository.bulk_create([{"title": f"Note {i}", "content": "text"} for i in range(5)])
+        self.assertEqual(len(ids), 5)
+
+        self.repository.bulk_update([{"id": ids[0], "title": "Changed"}])
+        notes = self.repository.get_many([ids[1], ids[0], 999])
+        self.assertEqual([note.id for note in notes], [ids[1], ids[0]])
+        self.assertEqual(notes[1].title, "Changed")
+
+        self.assertEqual(self.repository.bulk_delete(ids[:3]), 3)
+        self.assertEqual(self.count_notes(), 2)
+
+    def test_list_summaries_and_search(self):
+        ids = self.repository.bulk_create([
+            {"title": "Shopping", "content": "milk bread " * 100},
+            {"title": "Travel", "content": "pack the passport and tickets"},
+            {"title": "Ideas", "content": "read about passport photos"},
+        ])
+
+        page = self.repository.list_summaries(limit=2)
+        self.assertEqual([note.id for note in page], ids[:2])
+        self.assertEqual(len(page[0].snippet), 200)
+        self.assertEqual([note.id for note in self.repository.list_summaries(2, after_id=ids[1])], ids[2:])
+
+        found = self.repository.search("passport tickets", limit=10)
+        self.assertEqual([note.id for note in found], [ids[1]])
+        self.assertEqual(len(self.repository.search("passport", limit=10)), 2)
+
+
 if __name__ == "__main__":
     unittest.main()
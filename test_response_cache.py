@@ -0,0 +1,43 @@
+from cache_versions import SQLiteVersions
+from response_cache import ResponseCache, create_response_cache
+
+
+def test_invalidation_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = ResponseCache(10, 60, versions=SQLiteVersions(path, refresh=0))
+    second = ResponseCache(10, 60, versions=SQLiteVersions(path, refresh=0))
+
+    second.set("contact:1", b"old", {}, second.version("contact:1"))
+    assert second.get("contact:1").body == b"old"
+
+    stale_version = second.version("contact:1")
+    first.invalidate("contact:1")
+    assert second.get("contact:1") is None
+    # Ответ, прочитанный до инвалидации в другом воркере, не сохраняется
+    second.set("contact:1", b"old", {}, stale_version)
+    assert second.get("contact:1") is None
+
+
+def test_invalidate_keeps_other_groups():
+    cache = ResponseCache(10, 60)
+    cache.set("contact:1", b"one", {}, cache.version("contact:1"))
+    cache.set("contact:2", b"two", {}, cache.version("contact:2"))
+    cache.set("contacts:0:100", b"[]", {}, cache.version("contacts"), "contacts")
+
+    cache.invalidate("contact:1", "contacts")
+    assert cache.get("contact:1") is None
+    assert cache.get("contacts:0:100", "contacts") is None
+    assert cache.get("contact:2").body == b"two"
+
+    cache.clear()
+    assert cache.get("contact:2") is None
+
+
+def test_cache_is_disabled_for_several_workers_without_storage(tmp_path):
+    cache = create_response_cache(None, workers=4)
+    cache.set("contact:1", b"body", {}, cache.version("contact:1"))
+    assert cache.get("contact:1") is None
+
+    cache = create_response_cache(str(tmp_path / "cache.db"), workers=4)
+    cache.set("contact:1", b"body", {}, cache.version("contact:1"))
+    assert cache.get("contact:1").body == b"body"